@@ -76,6 +76,8 @@ class SecureEditorTab(QWidget):
         lay.addWidget(self.text_edit, 1)
 
         self.current_file: Optional[str] = None
+        # 解锁后的编辑会话，保存时只重新加密改动的分块
+        self.document: Optional[core.SecureDocument] = None
 
     # ----- 新增 新建文件逻辑 -----
     def new_file(self):
@@ -100,6 +102,7 @@ class SecureEditorTab(QWidget):
             return
 
         self.current_file = path
+        self.document = None
         self.text_edit.clear()  # 清空文本编辑器
         self.text_edit.setReadOnly(False)  # 进入编辑状态
 
@@ -119,9 +122,10 @@ class SecureEditorTab(QWidget):
             return
 
         self.current_file = path
+        self.document = None
         self.action_export.setEnabled(False)  # 禁用导出按钮（直到解锁）
         try:
-            core.load_file(path)  # 验证合法性
+            self._verify(path)  # 验证合法性（解密结果缓存供解锁时复用）
             self.text_edit.setPlainText("受控文件已加载，点击“解锁文件”以查看明文")
             self.text_edit.setReadOnly(True)
             self.action_unlock.setEnabled(True)
@@ -138,8 +142,8 @@ class SecureEditorTab(QWidget):
         if not self.current_file:
             return
         try:
-            txt = core.load_file(self.current_file)
-            self.text_edit.setPlainText(txt)
+            self.document = core.SecureDocument.open(self.current_file)
+            self.text_edit.setPlainText(self.document.text)
             self.text_edit.setReadOnly(False)
             self.action_unlock.setEnabled(False)
             self.action_save.setEnabled(True)
@@ -169,13 +173,17 @@ class SecureEditorTab(QWidget):
             new_path = self.current_file
 
         try:
-            core.save_file(new_path, self.text_edit.toPlainText())
+            # 同一文件增量保存，否则整体写入新的受控文件
+            if self.document is None or self.document.file_path != new_path:
+                self.document = core.SecureDocument(new_path)
+            self.document.save(self.text_edit.toPlainText())
 
             # 删除原始文件（如果是另一个）
             if new_path != self.current_file and os.path.exists(self.current_file):
                 os.remove(self.current_file)
 
             self.current_file = new_path
+            self.document = None
             self.text_edit.setReadOnly(True)
             self.action_unlock.setEnabled(False)
             self.action_save.setEnabled(False)
@@ -224,6 +232,21 @@ class SecureEditorTab(QWidget):
         except Exception as e:
             self._err("导出失败", str(e))
 
+    def _verify(self, path: str):
+        # 上一次保存未完成时，经用户确认后截掉未写完的数据，恢复为上一次保存的内容
+        try:
+            core.verify_file(path)
+        except core.IncompleteSaveError as e:
+            box = MessageBox(
+                "文件保存未完成",
+                f"{e}\n是否恢复为上一次保存的内容？未写完的数据将被删除。",
+                self.window(),
+            )
+            if not box.exec():
+                raise
+            core.recover_file(path)
+            core.verify_file(path)
+
     def _handle_open_error(self, path: str, ve: ValueError):
         msg = str(ve)
         self.file_label.setTextColor(Qt.red)
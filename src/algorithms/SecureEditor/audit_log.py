@@ -0,0 +1,261 @@
+from datetime import datetime
+from typing import Optional
+import atexit
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+from .audit_store import AuditStore
+
+# 默认参数：队列容量、单次批量写入的最大条数、周期刷新间隔（秒）、日志轮转大小与保留份数
+QUEUE_SIZE = 10000
+BATCH_SIZE = 1000
+FLUSH_INTERVAL = 1.0
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+# 后台线程存活检查的间隔（秒）：入队或等待刷新时按此间隔确认后台线程仍在运行，避免永久阻塞
+_WAIT_INTERVAL = 0.5
+
+
+def format_record(timestamp: float, action: str, filepath: str, result: str) -> str:
+    """
+    按审计日志的文本格式格式化一条记录
+
+    :param timestamp: 记录时间（time.time() 返回值）
+    :return: 一行日志文本（含换行符）
+    """
+    when = datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{when}] {action} | 文件: {filepath} | 结果: {result}\n"
+
+
+def _clean(text) -> str:
+    """把无法编码为 UTF-8 的字符（如 os.walk 返回的不可解码文件名中的代理字符）替换为转义序列"""
+    return str(text).encode("utf-8", errors="backslashreplace").decode("utf-8")
+
+
+class AuditLogger:
+    """
+    异步缓冲的审计日志记录器
+
+    调用方只把记录放入有界队列即返回（队列满时阻塞，形成背压）；后台线程批量取出记录、
+    格式化后一次写入，空闲或距上次刷新超过 flush_interval 时刷新到磁盘，文件超过 max_bytes 时轮转。
+    进程退出时（atexit）会写完队列中剩余的记录。
+
+    指定 db_path 时，每批记录同时写入 SQLite 审计库（见 audit_store），并记录文本日志已同步到的位置；
+    后台线程启动时先把文本日志中尚未入库的记录导入审计库。
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = MAX_BYTES,
+        backup_count: int = BACKUP_COUNT,
+        queue_size: int = QUEUE_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        db_path: Optional[str] = None,
+    ):
+        """
+        :param path: 日志文件路径
+        :param max_bytes: 单个日志文件的最大字节数，0 表示不轮转
+        :param backup_count: 轮转时保留的历史文件数（path.1 ... path.N）
+        :param queue_size: 待写入记录队列的容量
+        :param flush_interval: 周期刷新间隔（秒）
+        :param db_path: SQLite 审计库路径，为 None 时只写文本日志
+        """
+        self.path = path
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = False
+        self._file = None
+        self._store = None
+        self._thread = threading.Thread(target=self._run, name="AuditLogger", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def log(self, action: str, filepath: str, result: str):
+        """
+        记录一条审计日志（异步写入）
+
+        :param action: 操作名称
+        :param filepath: 操作的文件路径
+        :param result: 操作结果描述
+        """
+        record = (time.time(), action, filepath, result)
+        if self._closed or not self._put(record):
+            # 已关闭（如进程退出阶段）或后台线程意外退出时直接同步追加
+            try:
+                with open(self.path, "ab") as f:
+                    f.write(format_record(*record).encode("utf-8", errors="backslashreplace"))
+            except OSError as e:
+                print(f"审计日志写入失败：{e}", file=sys.stderr)
+
+    def flush(self):
+        """等待此前提交的全部记录写入并刷新到磁盘（后台线程已退出时立即返回）"""
+        if self._closed:
+            return
+        done = threading.Event()
+        if not self._put(done):
+            return
+        while not done.wait(_WAIT_INTERVAL):
+            if not self._thread.is_alive():
+                return
+
+    def close(self):
+        """写完剩余记录并停止后台线程，可重复调用"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._put(None):
+            self._thread.join()
+        atexit.unregister(self.close)
+
+    def _put(self, item) -> bool:
+        """放入队列（队列满时等待）；后台线程已退出时返回 False，不再等待"""
+        while True:
+            if not self._thread.is_alive():
+                return False
+            try:
+                self._queue.put(item, timeout=_WAIT_INTERVAL)
+                return True
+            except queue.Full:
+                continue
+
+    def _run(self):
+        # SQLite 连接只能在创建它的线程中使用，因此在后台线程中打开
+        if self.db_path is not None:
+            try:
+                self._store = AuditStore(self.db_path)
+                self._store.migrate_text_log(self.path)
+            except (OSError, sqlite3.Error) as e:
+                print(f"审计库打开失败：{e}", file=sys.stderr)
+                self._store = None
+        try:
+            self._loop()
+        finally:
+            if self._store is not None:
+                self._store.close()
+
+    def _loop(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush_file()
+                last_flush = time.monotonic()
+                continue
+
+            # 取出当前已排队的记录，凑成一批写入
+            batch = []
+            while True:
+                if item is None or isinstance(item, threading.Event):
+                    self._write(batch)
+                    batch = []
+                    self._flush_file()
+                    last_flush = time.monotonic()
+                    if item is None:
+                        self._close_file()
+                        return
+                    item.set()
+                else:
+                    batch.append(item)
+                if len(batch) >= BATCH_SIZE:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._write(batch)
+
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self._flush_file()
+                last_flush = time.monotonic()
+
+    def _write(self, batch: list):
+        """格式化并写入一批记录，写入失败时输出到标准错误而不中断后台线程"""
+        if not batch:
+            return
+        try:
+            try:
+                data = "".join(format_record(*record) for record in batch).encode("utf-8")
+            except UnicodeEncodeError:
+                # 文本日志与审计库写入相同的转义后内容，保证两者一致
+                batch = [(ts, _clean(action), _clean(filepath), _clean(result)) for ts, action, filepath, result in batch]
+                data = "".join(format_record(*record) for record in batch).encode("utf-8")
+        except Exception as e:
+            print(f"审计日志写入失败：{e}", file=sys.stderr)
+            return
+        offset = None
+        try:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            if self.max_bytes and self._file.tell() and self._file.tell() + len(data) > self.max_bytes:
+                self._rotate()
+            self._file.write(data)
+            if self._store is not None:
+                # 先落盘再记录同步位置，崩溃后重启时据此补导入，不会重复
+                self._file.flush()
+                offset = self._file.tell()
+        except Exception as e:
+            print(f"审计日志写入失败：{e}", file=sys.stderr)
+
+        if self._store is not None:
+            try:
+                self._store.add_many(batch, self.path if offset is not None else None, offset)
+            except Exception as e:
+                print(f"审计库写入失败：{e}", file=sys.stderr)
+
+    def _rotate(self):
+        """关闭当前文件，将 path.(i) 依次改名为 path.(i+1)，再重新打开空文件"""
+        self._close_file()
+        if self.backup_count > 0:
+            for i in range(self.backup_count - 1, 0, -1):
+                src = f"{self.path}.{i}"
+                if os.path.exists(src):
+                    os.replace(src, f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "ab")
+
+    def _flush_file(self):
+        if self._file is not None:
+            try:
+                self._file.flush()
+            except OSError as e:
+                print(f"审计日志写入失败：{e}", file=sys.stderr)
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError as e:
+                print(f"审计日志写入失败：{e}", file=sys.stderr)
+            self._file = None
+
+
+_loggers: dict[str, AuditLogger] = {}
+_loggers_lock = threading.Lock()
+
+
+def get_logger(path: str, db_path: Optional[str] = None) -> AuditLogger:
+    """
+    获取写入指定路径的共享记录器（按需创建；fork 出的子进程中会重新创建）
+
+    :param path: 日志文件路径
+    :param db_path: SQLite 审计库路径（仅在创建记录器时生效）
+    :return: AuditLogger 实例
+    """
+    with _loggers_lock:
+        logger = _loggers.get(path)
+        if logger is None or logger.pid != os.getpid():
+            logger = _loggers[path] = AuditLogger(path, db_path=db_path)
+        return logger
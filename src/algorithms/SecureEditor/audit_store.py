@@ -0,0 +1,216 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional, Union
+import os
+import re
+import sqlite3
+
+# 审计记录表按时间、操作与路径建立索引；imports 表记录文本日志已导入到的字节偏移，
+# 使文本日志的导入可以增量进行而不会重复
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    action TEXT NOT NULL,
+    path TEXT NOT NULL,
+    result TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS audit_ts ON audit (ts);
+CREATE INDEX IF NOT EXISTS audit_action_ts ON audit (action, ts);
+CREATE INDEX IF NOT EXISTS audit_path_ts ON audit (path, ts);
+CREATE TABLE IF NOT EXISTS imports (
+    source TEXT PRIMARY KEY,
+    offset INTEGER NOT NULL
+);
+"""
+
+# 文本日志行格式，见 audit_log.format_record
+_LINE = re.compile(r"^\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\] (.*?) \| 文件: (.*) \| 结果: (.*)$")
+
+_IMPORT_BATCH = 10000
+
+
+@dataclass
+class AuditRecord:
+    timestamp: datetime
+    action: str
+    filepath: str
+    result: str
+
+
+def _to_timestamp(value: Union[datetime, float, None]) -> Optional[float]:
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return value
+
+
+def _prefix_upper(prefix: str) -> Optional[str]:
+    """返回大于所有以 prefix 开头的字符串的最小上界，不存在时返回 None"""
+    while prefix and ord(prefix[-1]) == 0x10FFFF:
+        prefix = prefix[:-1]
+    if not prefix:
+        return None
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class AuditStore:
+    """
+    基于 SQLite 的结构化审计日志存储
+
+    按时间、操作、路径前缀查询时走索引，不再需要全量扫描文本日志。
+    一个实例只能在创建它的线程中使用。
+    """
+
+    def __init__(self, db_path: str):
+        """
+        :param db_path: 数据库文件路径（不存在时自动创建）
+        """
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path)
+        # WAL 模式下查询不会阻塞后台线程的写入
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._conn.close()
+
+    def add_many(
+        self,
+        records: Iterable[tuple[float, str, str, str]],
+        source: Optional[str] = None,
+        offset: Optional[int] = None,
+    ):
+        """
+        批量写入审计记录（单个事务）
+
+        :param records: (时间戳, 操作, 文件路径, 结果) 序列
+        :param source: 同时写入了这些记录的文本日志路径
+        :param offset: 写入后该文本日志的长度，记为已导入位置，避免以后重复导入
+        """
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO audit (ts, action, path, result) VALUES (?, ?, ?, ?)", records
+            )
+            if source is not None:
+                self._set_offset(source, offset)
+
+    def query(
+        self,
+        start: Union[datetime, float, None] = None,
+        end: Union[datetime, float, None] = None,
+        action: Optional[str] = None,
+        path_prefix: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> list[AuditRecord]:
+        """
+        按条件查询审计记录，结果按时间先后排序
+
+        :param start: 起始时间（含）
+        :param end: 结束时间（不含）
+        :param action: 操作名称
+        :param path_prefix: 文件路径前缀
+        :param limit: 最多返回的条数
+        :return: AuditRecord 列表
+        """
+        clauses, params = [], []
+        if start is not None:
+            clauses.append("ts >= ?")
+            params.append(_to_timestamp(start))
+        if end is not None:
+            clauses.append("ts < ?")
+            params.append(_to_timestamp(end))
+        if action is not None:
+            clauses.append("action = ?")
+            params.append(action)
+        if path_prefix:
+            # 用范围条件代替 LIKE，才能使用 path 索引
+            clauses.append("path >= ?")
+            params.append(path_prefix)
+            upper = _prefix_upper(path_prefix)
+            if upper is not None:
+                clauses.append("path < ?")
+                params.append(upper)
+
+        sql = "SELECT ts, action, path, result FROM audit"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY ts, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [
+            AuditRecord(datetime.fromtimestamp(ts), action, path, result)
+            for ts, action, path, result in self._conn.execute(sql, params)
+        ]
+
+    def import_text_log(self, log_path: str, record_offset: bool = True) -> int:
+        """
+        从文本日志增量导入审计记录（从上次导入的位置继续，文件变短时视为已轮转，从头导入）
+
+        :param log_path: 文本日志路径
+        :param record_offset: 是否记录导入位置
+        :return: 导入的记录数
+        """
+        if not os.path.exists(log_path):
+            return 0
+        offset = (self._get_offset(log_path) or 0) if record_offset else 0
+        if offset > os.path.getsize(log_path):
+            offset = 0
+
+        count = 0
+        with open(log_path, "rb") as f:
+            f.seek(offset)
+            batch = []
+            for line in f:
+                # 末尾不完整的行留到下次导入
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                match = _LINE.match(line.decode("utf-8", errors="replace").rstrip("\r\n"))
+                if match:
+                    when, action, path, result = match.groups()
+                    ts = datetime.strptime(when, "%Y-%m-%d %H:%M:%S").timestamp()
+                    batch.append((ts, action, path, result))
+                if len(batch) >= _IMPORT_BATCH:
+                    self.add_many(batch, log_path if record_offset else None, offset)
+                    count += len(batch)
+                    batch = []
+            self.add_many(batch, log_path if record_offset else None, offset)
+            count += len(batch)
+        return count
+
+    def migrate_text_log(self, log_path: str) -> int:
+        """
+        导入文本日志：首次迁移时先按从旧到新的顺序导入轮转出的历史文件（path.N ... path.1），
+        之后只增量导入当前日志文件
+
+        :param log_path: 文本日志路径
+        :return: 导入的记录数
+        """
+        count = 0
+        if self._get_offset(log_path) is None:
+            backups = []
+            i = 1
+            while os.path.exists(f"{log_path}.{i}"):
+                backups.append(f"{log_path}.{i}")
+                i += 1
+            for backup in reversed(backups):
+                count += self.import_text_log(backup, record_offset=False)
+        return count + self.import_text_log(log_path)
+
+    def _get_offset(self, source: str) -> Optional[int]:
+        row = self._conn.execute("SELECT offset FROM imports WHERE source = ?", (source,)).fetchone()
+        return None if row is None else row[0]
+
+    def _set_offset(self, source: str, offset: int):
+        self._conn.execute(
+            "INSERT INTO imports (source, offset) VALUES (?, ?) "
+            "ON CONFLICT (source) DO UPDATE SET offset = excluded.offset",
+            (source, offset),
+        )
@@ -0,0 +1,280 @@
+import hashlib
+import os
+
+from .base import Cipher, AEADCipher
+from .sm4_cipher import SM4
+from .sm4_modes import SM4GCM, NONCE_SIZE, TAG_SIZE
+from .sm3_cipher import SM3
+
+# 导入时探测本机的原生实现（cryptography 的 SM4、OpenSSL 经 hashlib 提供的 SM3），
+# 与纯 Python 参考实现逐字节比对自检通过后优先使用，否则回退到参考实现。
+# 环境变量：python 表示强制使用纯 Python 参考实现，auto（默认）表示自动选择
+BACKEND_ENV = "ESP32_CRYPTO_BACKEND"
+
+class OpenSSLSM3(Cipher):
+    """基于 hashlib（OpenSSL）的 SM3 实现，接口与 SM3 一致"""
+
+    def __init__(self):
+        hashlib.new("sm3")
+
+    def encrypt(self, message: bytes) -> bytes:
+        return self.hash(message)
+
+    def decrypt(self, ciphertext: bytes) -> bytes:
+        raise NotImplementedError("SM3 does not support decrypt.")
+
+    def hash(self, message: bytes) -> bytes:
+        """
+        计算输入消息的 SM3 哈希值
+
+        :param message: 要计算哈希值的消息（bytes）
+        :return: 32字节（256位）的哈希值（bytes）
+        """
+        return hashlib.new("sm3", message).digest()
+
+    def hash_many(self, messages) -> list[bytes]:
+        """
+        批量计算多条消息的 SM3 哈希值
+
+        :param messages: 消息序列（每条为 bytes-like）
+        :return: 与输入顺序一致的哈希值列表
+        """
+        return [hashlib.new("sm3", message).digest() for message in messages]
+
+    def hasher(self, data: bytes = b""):
+        """
+        创建增量哈希对象（hashlib 对象本身即支持 update()/copy()/digest()/hexdigest()）
+
+        :param data: 初始数据（bytes-like）
+        :return: hashlib 哈希对象
+        """
+        return hashlib.new("sm3", data)
+
+class _CryptographyContext:
+    """将 cryptography 的 CBC 上下文与 PKCS7 填充组合为 update()/finalize() 接口"""
+
+    def __init__(self, context, padding, encrypting: bool):
+        self._context = context
+        self._padding = padding
+        self._encrypting = encrypting
+
+    def update(self, data) -> bytes:
+        if self._encrypting:
+            return self._context.update(self._padding.update(data))
+        return self._padding.update(self._context.update(data))
+
+    def finalize(self) -> bytes:
+        if self._encrypting:
+            return self._context.update(self._padding.finalize()) + self._context.finalize()
+        return self._padding.update(self._context.finalize()) + self._padding.finalize()
+
+class CryptographySM4(Cipher):
+    """基于 cryptography 库的 SM4-CBC（PKCS7 填充）实现，接口与 SM4 一致"""
+
+    def __init__(self, iv: bytes, key: bytes):
+        from cryptography.hazmat.primitives import padding
+        from cryptography.hazmat.primitives.ciphers import Cipher as _Cipher, algorithms, modes
+
+        if not isinstance(key, bytes) or len(key) != 16:
+            raise ValueError("密钥必须是16字节（128位）长度的bytes类型")
+        self.iv = iv
+        self._padding = padding.PKCS7(128)
+        self._cipher = _Cipher(algorithms.SM4(key), modes.CBC(iv))
+
+    def encryptor(self) -> _CryptographyContext:
+        """创建 CBC 模式的增量加密上下文"""
+        return _CryptographyContext(self._cipher.encryptor(), self._padding.padder(), True)
+
+    def decryptor(self) -> _CryptographyContext:
+        """创建 CBC 模式的增量解密上下文"""
+        return _CryptographyContext(self._cipher.decryptor(), self._padding.unpadder(), False)
+
+    def encrypt(self, plaintext: bytes) -> bytes:
+        context = self.encryptor()
+        return context.update(plaintext) + context.finalize()
+
+    def decrypt(self, ciphertext: bytes) -> bytes:
+        if not ciphertext or len(ciphertext) % 16:
+            raise ValueError("密文长度必须是16的非零倍数")
+        context = self.decryptor()
+        return context.update(ciphertext) + context.finalize()
+
+    def decrypt_into(self, ciphertext, out) -> int:
+        """
+        从任意 bytes-like 对象读取密文，明文直接写入调用方提供的缓冲区
+
+        :param ciphertext: 密文数据（bytes-like）
+        :param out: 可写的输出缓冲区，长度不小于密文长度，且不能与密文重叠
+        :return: 去除填充后的明文长度（out 中其后的字节为填充数据）
+        """
+        src = memoryview(ciphertext).cast("B")
+        dst = memoryview(out).cast("B")
+        if not src or len(src) % 16:
+            raise ValueError("密文长度必须是16的非零倍数")
+        if len(dst) < len(src):
+            raise ValueError("输出缓冲区长度不足")
+
+        # update_into 要求输出缓冲区比输入多留一个分组的余量，因此最后一个分组单独处理
+        context = self._cipher.decryptor()
+        context.update_into(src[:-16], dst)
+        last = context.update(src[-16:]) + context.finalize()
+        dst[len(src) - 16:len(src)] = last
+        unpadder = self._padding.unpadder()
+        return len(src) - 16 + len(unpadder.update(last) + unpadder.finalize())
+
+class CryptographySM4GCM(AEADCipher):
+    """基于 cryptography 库的 SM4-GCM 实现，接口与 SM4GCM 一致（未指定 IV 时随机生成并置于输出之前）"""
+
+    def __init__(self, key: bytes):
+        from cryptography.hazmat.primitives.ciphers import algorithms
+
+        if not isinstance(key, bytes) or len(key) != 16:
+            raise ValueError("密钥必须是16字节（128位）长度的bytes类型")
+        self._algorithm = algorithms.SM4(key)
+
+    def encrypt(self, plaintext: bytes, associated_data: bytes = b"", iv: bytes = None) -> bytes:
+        from cryptography.hazmat.primitives.ciphers import Cipher as _Cipher, modes
+
+        prefix = b""
+        if iv is None:
+            iv = prefix = os.urandom(NONCE_SIZE)
+        context = _Cipher(self._algorithm, modes.GCM(iv)).encryptor()
+        context.authenticate_additional_data(associated_data)
+        ciphertext = context.update(plaintext) + context.finalize()
+        return prefix + ciphertext + context.tag
+
+    def decrypt(self, ciphertext: bytes, associated_data: bytes = b"", iv: bytes = None) -> bytes:
+        from cryptography.exceptions import InvalidTag
+        from cryptography.hazmat.primitives.ciphers import Cipher as _Cipher, modes
+
+        if iv is None:
+            if len(ciphertext) < NONCE_SIZE:
+                raise ValueError("密文长度不足")
+            iv = bytes(ciphertext[:NONCE_SIZE])
+            ciphertext = memoryview(ciphertext)[NONCE_SIZE:]
+        if len(ciphertext) < TAG_SIZE:
+            raise ValueError("密文长度不足")
+        body = memoryview(ciphertext)[:len(ciphertext) - TAG_SIZE]
+        tag = bytes(ciphertext[-TAG_SIZE:])
+        context = _Cipher(self._algorithm, modes.GCM(iv, tag)).decryptor()
+        context.authenticate_additional_data(associated_data)
+        try:
+            return context.update(body) + context.finalize()
+        except InvalidTag:
+            raise ValueError("认证标签校验失败")
+
+# 后端注册表：名称 -> 构造函数，python 为参考实现
+SM4_BACKENDS = {"python": SM4}
+SM4_GCM_BACKENDS = {"python": SM4GCM}
+SM3_BACKENDS = {"python": SM3}
+
+_SELF_TEST_KEY = bytes(range(16))
+_SELF_TEST_IV = bytes(range(16, 32))
+_SELF_TEST_MESSAGES = [b"", b"abc", bytes(range(256)) * 3 + b"tail"]
+
+def _self_test_sm4(factory) -> bool:
+    """将候选 SM4 实现与参考实现逐字节比对"""
+    reference = SM4(_SELF_TEST_IV, _SELF_TEST_KEY)
+    candidate = factory(_SELF_TEST_IV, _SELF_TEST_KEY)
+    for message in _SELF_TEST_MESSAGES:
+        expected = reference.encrypt(message)
+        if candidate.encrypt(message) != expected or candidate.decrypt(expected) != message:
+            return False
+        context = candidate.encryptor()
+        if context.update(message) + context.finalize() != expected:
+            return False
+        out = bytearray(len(expected))
+        if bytes(out[:candidate.decrypt_into(memoryview(expected), out)]) != message:
+            return False
+    return True
+
+def _self_test_sm4_gcm(factory) -> bool:
+    """将候选 SM4-GCM 实现与参考实现逐字节比对，并确认篡改会被拒绝"""
+    reference = SM4GCM(_SELF_TEST_KEY)
+    candidate = factory(_SELF_TEST_KEY)
+    for message in _SELF_TEST_MESSAGES:
+        for iv in (_SELF_TEST_IV[:12], _SELF_TEST_IV):
+            expected = reference.encrypt(message, _SELF_TEST_KEY, iv=iv)
+            if candidate.encrypt(message, _SELF_TEST_KEY, iv=iv) != expected:
+                return False
+            if candidate.decrypt(expected, _SELF_TEST_KEY, iv=iv) != message:
+                return False
+        # 未指定 IV 时各自随机生成并置于输出之前，双方应能互相解密
+        if reference.decrypt(candidate.encrypt(message, _SELF_TEST_KEY), _SELF_TEST_KEY) != message:
+            return False
+        if candidate.decrypt(reference.encrypt(message, _SELF_TEST_KEY), _SELF_TEST_KEY) != message:
+            return False
+        try:
+            candidate.decrypt(expected, b"", iv=_SELF_TEST_IV)
+            return False
+        except ValueError:
+            pass
+    return True
+
+def _self_test_sm3(factory) -> bool:
+    """将候选 SM3 实现与参考实现逐字节比对"""
+    reference = SM3()
+    candidate = factory()
+    for message in _SELF_TEST_MESSAGES:
+        expected = reference.hash(message)
+        if candidate.hash(message) != expected:
+            return False
+        hasher = candidate.hasher()
+        for i in range(0, len(message), 100):
+            hasher.update(message[i:i + 100])
+        if hasher.digest() != expected:
+            return False
+    return True
+
+def _probe():
+    """探测原生实现，自检通过后注册到后端表中"""
+    candidates = [
+        (SM4_BACKENDS, "cryptography", CryptographySM4, _self_test_sm4),
+        (SM4_GCM_BACKENDS, "cryptography", CryptographySM4GCM, _self_test_sm4_gcm),
+        (SM3_BACKENDS, "openssl", OpenSSLSM3, _self_test_sm3),
+    ]
+    for registry, name, factory, self_test in candidates:
+        try:
+            if self_test(factory):
+                registry[name] = factory
+        except Exception:
+            # 库不存在、不支持该算法或行为不一致时，保持使用参考实现
+            pass
+
+def _select(registry: dict) -> str:
+    """根据环境变量与探测结果选择后端名称"""
+    if os.environ.get(BACKEND_ENV, "auto").lower() == "python":
+        return "python"
+    return next((name for name in registry if name != "python"), "python")
+
+_probe()
+SM4_BACKEND = _select(SM4_BACKENDS)
+SM4_GCM_BACKEND = _select(SM4_GCM_BACKENDS)
+SM3_BACKEND = _select(SM3_BACKENDS)
+
+def sm4(iv: bytes, key: bytes) -> Cipher:
+    """
+    创建当前选定后端的 SM4-CBC 实例
+
+    :param iv: 初始向量（bytes），长度为16字节
+    :param key: 密钥（bytes），长度为16字节
+    :return: SM4 实例
+    """
+    return SM4_BACKENDS[SM4_BACKEND](iv, key)
+
+def sm4_gcm(key: bytes) -> AEADCipher:
+    """
+    创建当前选定后端的 SM4-GCM 实例（IV 在每次加解密时指定，未指定时随机生成）
+
+    :param key: 密钥（bytes），长度为16字节
+    :return: SM4-GCM 实例
+    """
+    return SM4_GCM_BACKENDS[SM4_GCM_BACKEND](key)
+
+def sm3() -> Cipher:
+    """
+    创建当前选定后端的 SM3 实例
+
+    :return: SM3 实例
+    """
+    return SM3_BACKENDS[SM3_BACKEND]()
@@ -13,6 +13,19 @@ class Cipher(ABC):
         """解密方法，子类需要实现"""
         pass
 
+class AEADCipher(Cipher):
+    """抽象基类：定义带关联数据的认证加密算法接口"""
+
+    @abstractmethod
+    def encrypt(self, plaintext: bytes, associated_data: bytes = b"") -> bytes:
+        """加密并生成认证标签，子类需要实现"""
+        pass
+
+    @abstractmethod
+    def decrypt(self, ciphertext: bytes, associated_data: bytes = b"") -> bytes:
+        """校验认证标签并解密，校验失败时抛出 ValueError，子类需要实现"""
+        pass
+
 class SignatureAlgorithm(ABC):
     """抽象基类：定义统一的签名算法接口"""
 
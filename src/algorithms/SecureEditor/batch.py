@@ -0,0 +1,255 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from fnmatch import fnmatch
+from typing import Callable, Iterator, Optional
+import argparse
+import json
+import os
+import sys
+import time
+
+from . import secure_core as core
+
+# 支持的批量操作及其默认匹配的文件名模式
+OPERATIONS = {"encrypt": "*", "decrypt": "*.sec", "verify": "*.sec"}
+_ACTIONS = {"encrypt": "批量加密", "decrypt": "批量解密", "verify": "批量校验"}
+
+# 加密时每次从明文文件读入的长度
+_READ_SIZE = 1 << 20
+
+
+@dataclass
+class FileResult:
+    path: str
+    output: Optional[str]
+    ok: bool
+    size: int
+    seconds: float
+    error: Optional[str] = None
+    # 目标文件已存在且未指定覆盖时跳过，不计入失败
+    skipped: bool = False
+
+
+@dataclass
+class BatchSummary:
+    operation: str
+    root: str
+    total: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    bytes: int = 0
+    seconds: float = 0.0
+    manifest_path: Optional[str] = None
+    results: list[FileResult] = field(default_factory=list)
+
+    @property
+    def mb_per_s(self) -> float:
+        """整体吞吐率（MB/s，按输入文件大小计）"""
+        return self.bytes / (1 << 20) / self.seconds if self.seconds else 0.0
+
+
+def _read_pieces(path: str) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        while True:
+            data = f.read(_READ_SIZE)
+            if not data:
+                return
+            yield data
+
+
+def _output_path(operation: str, path: str) -> Optional[str]:
+    """操作生成的目标文件路径；校验不生成文件，返回 None"""
+    if operation == "encrypt":
+        return path + ".sec"
+    if operation == "decrypt":
+        return path[:-4] if path.endswith(".sec") else path + ".dec"
+    return None
+
+
+def _encrypt(path: str, output: str, compression: Optional[str]) -> str:
+    # 批处理已按文件分发到进程池，单个文件不再另开进程池
+    core.stream_save(output, _read_pieces(path), compression=compression, workers=1)
+    return output
+
+
+def _decrypt(path: str, output: str, compression: Optional[str]) -> str:
+    tmp_path = output + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            for chunk in core.iter_load(path):
+                f.write(chunk)
+        os.replace(tmp_path, output)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return output
+
+
+def _verify(path: str, output: None, compression: Optional[str]) -> None:
+    # 流式校验，内存占用与文件大小无关
+    for _ in core.iter_load(path):
+        pass
+    return None
+
+
+_HANDLERS = {"encrypt": _encrypt, "decrypt": _decrypt, "verify": _verify}
+
+
+def _process(
+    operation: str, path: str, compression: Optional[str] = None, overwrite: bool = False
+) -> FileResult:
+    """工作进程入口：处理单个文件，异常转换为失败结果而不中断整个批次；目标文件已存在时跳过"""
+    start = time.perf_counter()
+    try:
+        size = os.path.getsize(path)
+        output = _output_path(operation, path)
+        if output is not None and not overwrite and os.path.exists(output):
+            return FileResult(
+                path, output, False, size, time.perf_counter() - start, "目标文件已存在", skipped=True
+            )
+        output = _HANDLERS[operation](path, output, compression)
+        return FileResult(path, output, True, size, time.perf_counter() - start)
+    except Exception as e:
+        size = os.path.getsize(path) if os.path.exists(path) else 0
+        return FileResult(path, None, False, size, time.perf_counter() - start, str(e))
+
+
+def find_files(root: str, pattern: str, operation: str) -> list[str]:
+    """
+    递归列出 root 下文件名匹配 pattern 的文件（加密时跳过已是受控文件的 .sec 文件）
+
+    :return: 排序后的文件路径列表
+    """
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if not fnmatch(name, pattern):
+                continue
+            if operation == "encrypt" and name.endswith(".sec"):
+                continue
+            paths.append(os.path.join(dirpath, name))
+    return paths
+
+
+def print_progress(done: int, total: int, summary: BatchSummary):
+    """默认的进度输出：已处理数/总数、失败数、跳过数与吞吐率"""
+    print(
+        f"\r[{done}/{total}] 失败 {summary.failed}  跳过 {summary.skipped}  {summary.mb_per_s:.2f} MB/s",
+        end="\n" if done == total else "",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def run_batch(
+    root: str,
+    operation: str,
+    pattern: Optional[str] = None,
+    workers: Optional[int] = None,
+    manifest_path: Optional[str] = None,
+    progress: Optional[Callable[[int, int, BatchSummary], None]] = print_progress,
+    compression: Optional[str] = None,
+    overwrite: bool = False,
+) -> BatchSummary:
+    """
+    对目录树中的受控文件批量执行加密、解密或校验
+
+    文件分发到进程池并行处理；单个文件失败只记入结果，不影响其他文件。
+    每个文件的结果写入审计日志，全部完成后把汇总与逐文件结果写入 JSON 清单。
+
+    加密：明文文件 X 生成分块格式受控文件 X.sec（保留原文件）
+    解密：受控文件 X.sec 还原为 X
+    校验：流式校验受控文件的结构与完整性
+    加密与解密的目标文件已存在时默认跳过该文件（记入清单与审计日志，不计为失败）。
+
+    :param root: 目录路径
+    :param operation: encrypt / decrypt / verify
+    :param pattern: 文件名匹配模式（fnmatch），默认加密为 *，解密与校验为 *.sec
+    :param workers: 工作进程数，默认为 CPU 核数；为 1 时在当前进程中顺序处理
+    :param manifest_path: 清单路径，默认写入日志目录
+    :param progress: 进度回调 (已完成数, 总数, 当前汇总)，为 None 时不报告进度
+    :param compression: 加密时使用的压缩算法（zlib / lzma），为 None 时不压缩
+    :param overwrite: 是否覆盖已存在的目标文件
+    :return: 批处理汇总
+    """
+    if operation not in OPERATIONS:
+        raise ValueError(f"不支持的操作：{operation}")
+    paths = find_files(root, pattern or OPERATIONS[operation], operation)
+    workers = workers or os.cpu_count() or 1
+    summary = BatchSummary(operation, os.path.abspath(root), total=len(paths))
+
+    start = time.perf_counter()
+
+    def collect(result: FileResult):
+        summary.results.append(result)
+        if result.skipped:
+            summary.skipped += 1
+            core.write_log(_ACTIONS[operation], result.path, f"跳过（{result.error}）")
+        elif result.ok:
+            summary.succeeded += 1
+            summary.bytes += result.size
+            core.write_log(_ACTIONS[operation], result.path, "成功")
+        else:
+            summary.failed += 1
+            summary.bytes += result.size
+            core.write_log(_ACTIONS[operation], result.path, f"失败（{result.error}）")
+        summary.seconds = time.perf_counter() - start
+        if progress is not None:
+            progress(len(summary.results), len(paths), summary)
+
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            collect(_process(operation, path, compression, overwrite))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_process, operation, path, compression, overwrite) for path in paths]
+            for future in as_completed(futures):
+                collect(future.result())
+
+    summary.seconds = time.perf_counter() - start
+    summary.results.sort(key=lambda result: result.path)
+    summary.manifest_path = manifest_path or os.path.join(
+        core.LOG_DIR, f"batch_{operation}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    write_manifest(summary)
+    return summary
+
+
+def write_manifest(summary: BatchSummary):
+    """把批处理汇总与逐文件结果写入 JSON 清单"""
+    manifest = asdict(summary)
+    manifest["mb_per_s"] = summary.mb_per_s
+    manifest["finished_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with open(summary.manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="受控文件批量加密/解密/校验")
+    parser.add_argument("operation", choices=sorted(OPERATIONS))
+    parser.add_argument("root", help="目录路径")
+    parser.add_argument("--pattern", help="文件名匹配模式（fnmatch）")
+    parser.add_argument("--workers", type=int, help="工作进程数，默认为 CPU 核数")
+    parser.add_argument("--manifest", help="清单输出路径")
+    parser.add_argument("--compression", choices=sorted(core.COMPRESSION_FLAGS), help="加密前压缩")
+    parser.add_argument("--overwrite", action="store_true", help="覆盖已存在的目标文件（默认跳过）")
+    args = parser.parse_args()
+
+    result = run_batch(
+        args.root,
+        args.operation,
+        args.pattern,
+        args.workers,
+        args.manifest,
+        compression=args.compression,
+        overwrite=args.overwrite,
+    )
+    print(
+        f"完成：{result.succeeded} 成功，{result.failed} 失败，{result.skipped} 跳过，"
+        f"{result.bytes / (1 << 20):.1f} MB，{result.seconds:.1f} s，{result.mb_per_s:.2f} MB/s"
+    )
+    print(f"清单：{result.manifest_path}")
+    sys.exit(1 if result.failed else 0)
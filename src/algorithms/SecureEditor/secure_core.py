@@ -1,8 +1,21 @@
-from .sm4_cipher import SM4
-from .sm3_cipher import SM3
+from . import audit_log, audit_store, backend
+from .sm4_modes import TAG_SIZE
+from .sm3_tree import leaf_hash, merkle_root
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Iterable, Iterator, Optional, Union
+import bisect
+import io
+import itertools
+import lzma
+import mmap
+import struct
 import sys
 import os
+import threading
+import time
+import zlib
 
 # 常量定义
 IV = b"0123456789012345"
@@ -10,6 +23,72 @@ KEY = b"0123456789012345"
 MAGIC_HEADER = b"NPUSECENC001"
 HASH_SIZE = 32
 
+# 分块格式（NPUSECENC002）：
+#   文件头   MAGIC_HEADER_V2 | 标志位(u16) | 分块大小(u32) | 文件标识(16B)
+#   分块记录 类型(u8) | 分块序号(u64) | nonce(12B) | 密文长度(u32) | SM4-GCM 密文 | 认证标签(16B)
+#            （文件头指定压缩算法时，类型为 _KIND_DATA_COMPRESSED 的分块先压缩再加密，
+#            其叶子哈希按压缩后的数据计算，校验时无需先解压，也减少了 SM3 的计算量）
+#   尾部记录 与分块记录结构相同，明文为 分块数(u64) | 明文总长(u64) | 根哈希(32B) | 各分块 SM3 叶子哈希
+#            | 分块索引（设置 _FLAG_INDEX 时，每块为 记录偏移(u64) | 明文起始偏移(u64)）
+#   文件尾   尾部记录偏移(u64) | END_MAGIC
+# 每条记录以 文件头 + 记录头 作为关联数据单独认证，可独立解密；
+# 叶子哈希与根哈希（见 sm3_tree）保存在加密的尾部记录中，可逐块校验完整性；
+# 分块索引同样在加密的尾部记录中，SecureFile 据此只解密读取范围涉及的分块。
+# 带索引的文件以索引为准：分块明文长度可小于分块大小，记录在文件中的物理顺序与分块顺序无关，
+# 记录头中的序号只要求在文件内唯一。SecureDocument 增量保存时把改动的分块与新的尾部记录追加到
+# 文件末尾，原有未改动的记录继续由新索引引用（文件尾始终指向最新的尾部记录）。
+MAGIC_HEADER_V2 = b"NPUSECENC002"
+END_MAGIC = b"NPUSEEND"
+CHUNK_SIZE = 64 * 1024
+
+_V2_HEADER = struct.Struct(">HI16s")
+_RECORD = struct.Struct(">BQ12sI")
+_TRAILER = struct.Struct(">QQ32s")
+_FOOTER = struct.Struct(">Q8s")
+_INDEX_ENTRY = struct.Struct(">QQ")
+
+# 文件头标志位
+_FLAG_INDEX = 0x0001
+_FLAG_ZLIB = 0x0002
+_FLAG_LZMA = 0x0004
+_KNOWN_FLAGS = _FLAG_INDEX | _FLAG_ZLIB | _FLAG_LZMA
+
+_KIND_DATA = 0
+_KIND_TRAILER = 1
+_KIND_DATA_COMPRESSED = 2
+
+# 加密前的压缩算法（记录在文件头标志位中）。各分块单独判断：先压缩开头的一段样本，
+# 压缩后节省不足 _MIN_SAVING 的分块（如图片、压缩包等已压缩数据）不压缩直接存储
+COMPRESSION_FLAGS = {"zlib": _FLAG_ZLIB, "lzma": _FLAG_LZMA}
+_ZLIB_LEVEL = 1
+_LZMA_PRESET = 1
+_MIN_COMPRESS_SIZE = 256
+_SAMPLE_SIZE = 4096
+_MIN_SAVING = 0.1
+
+# 旧格式流式读取时每次读入的密文长度
+_READ_SIZE = 1 << 20
+
+# 旧格式加密/解密与哈希融合处理时的分片大小，使每片在仍驻留缓存时完成加解密与哈希
+_PIPELINE_SIZE = 64 * 1024
+
+# 并行保存与校验时每个工作进程至少分到的分块数，分块总数不足时不启动进程池
+_CHUNKS_PER_WORKER = 4
+
+# 增量保存时，失效数据超过有效数据（均按记录在文件中占用的字节计）或分块过于零碎时改为整体重写；
+# 失效数据不足 _COMPACT_MIN_WASTE 时不因此重写
+_COMPACT_MIN_WASTE = CHUNK_SIZE // 4
+
+# 解密结果缓存：verify_file 校验通过的明文短暂保存在进程内，供随后的 load_file 复用一次。
+# 键为 (绝对路径, 修改时间, 文件大小, 文件头)，文件发生任何变化都不会命中。
+# 过期条目由定时器清理，明文不会在过期后继续驻留；超过总字节上限的明文不缓存
+_CACHE_TTL = 30.0
+_CACHE_MAX_ENTRIES = 4
+_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_cache: dict[tuple, tuple[float, bytes]] = {}
+_cache_lock = threading.Lock()
+_cache_timer: Optional[threading.Timer] = None
+
 if getattr(sys, "frozen", False):
     BASE_DIR = os.path.dirname(sys.executable)
 else:
@@ -19,76 +98,1223 @@ LOG_DIR = os.path.join(BASE_DIR, "log")
 os.makedirs(LOG_DIR, exist_ok=True)
 
 LOG_PATH = os.path.join(LOG_DIR, "secure_editor.log")
+AUDIT_DB_PATH = os.path.join(LOG_DIR, "secure_editor.db")
+
+
+class IncompleteSaveError(ValueError):
+    """
+    上一次增量保存在追加过程中被中断：文件末尾残留未写完的数据，此前保存的内容仍完好
+
+    读取时不会自动回退到上一次保存的内容，需由调用方确认后调用 recover_file 恢复。
+    """
+
+    def __init__(self, end: int, size: int):
+        """
+        :param end: 上一次成功保存的有效内容末尾
+        :param size: 当前文件大小
+        """
+        super().__init__(f"文件保存未完成（末尾 {size - end} 字节未写完，可恢复为上一次保存的内容）")
+        self.end = end
+        self.size = size
 
 
 def write_log(action: str, filepath: str, result: str):
     """
-    写入日志信息到日志文件中
+    写入日志信息到日志文件中（由后台线程批量异步写入，见 audit_log）
 
     :param action: 操作名称
     :param filepath: 操作的文件路径
     :param result: 操作结果描述
     """
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(
-            f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] {action} | 文件: {filepath} | 结果: {result}\n"
-        )
+    audit_log.get_logger(LOG_PATH, AUDIT_DB_PATH).log(action, filepath, result)
 
 
-def load_file(file_path: str) -> str:
+def query_log(
+    start: Union[datetime, float, None] = None,
+    end: Union[datetime, float, None] = None,
+    action: Optional[str] = None,
+    path_prefix: Optional[str] = None,
+    limit: Optional[int] = None,
+) -> list[audit_store.AuditRecord]:
     """
-    加载并解密受控文件，验证哈希，返回原始文本内容
+    查询审计日志（走 SQLite 索引），查询前先等待已提交的日志写入完成
+
+    :param start: 起始时间（含）
+    :param end: 结束时间（不含）
+    :param action: 操作名称
+    :param path_prefix: 文件路径前缀
+    :param limit: 最多返回的条数
+    :return: 按时间排序的 AuditRecord 列表
+    """
+    audit_log.get_logger(LOG_PATH, AUDIT_DB_PATH).flush()
+    with audit_store.AuditStore(AUDIT_DB_PATH) as store:
+        return store.query(start, end, action, path_prefix, limit)
+
+
+def _decrypt_v1(raw) -> bytearray:
+    """
+    在原始文件内容上直接解密并校验旧格式（NPUSECENC001）数据
+
+    密文以 memoryview 形式原地访问，按分片解密后立即计算哈希并写入明文缓冲区，
+    整个过程只遍历一次数据，唯一的整块内存分配是明文输出缓冲区。
+
+    :param raw: 文件内容（bytes-like，如 mmap）
+    :return: 解密后的明文
+    :raises ValueError: 文件被篡改
+    """
+    decryptor = backend.sm4(IV, KEY).decryptor()
+    hasher = backend.sm3().hasher()
+    with memoryview(raw) as view, view[len(MAGIC_HEADER) : len(view) - HASH_SIZE] as encrypted:
+        hash_stored = bytes(view[len(view) - HASH_SIZE :])
+        plaintext = bytearray(len(encrypted))
+        size = 0
+        try:
+            for i in range(0, len(encrypted), _PIPELINE_SIZE):
+                chunk = decryptor.update(encrypted[i : i + _PIPELINE_SIZE])
+                hasher.update(chunk)
+                plaintext[size : size + len(chunk)] = chunk
+                size += len(chunk)
+            chunk = decryptor.finalize()
+            hasher.update(chunk)
+            plaintext[size : size + len(chunk)] = chunk
+            size += len(chunk)
+        except Exception:
+            size = None
+    # 在 except 之外抛出异常，避免异常链持有对 raw 的引用
+    if size is None:
+        raise ValueError("文件被篡改（解密失败）")
+
+    # 去除填充数据（原地截断）
+    del plaintext[size:]
+    if hasher.digest() != hash_stored:
+        raise ValueError("文件被篡改（哈希校验失败）")
+    return plaintext
+
+
+def _load_bytes(file_path: str, workers: int = 1) -> bytes:
+    """
+    解密并校验受控文件，返回明文字节（支持分块格式与旧格式）
+
+    旧格式文件通过 mmap 映射后原地解密，不再读入整个密文的副本。
 
     :param file_path: 文件路径
-    :return: 解密后的字符串内容
+    :param workers: 工作进程数，大于 1 时带索引的分块格式文件按分块区间并行解密与校验
+    :return: 解密后的明文
     :raises ValueError: 文件不是受控文件或被篡改或格式异常
     """
     with open(file_path, "rb") as f:
-        raw = f.read()
+        size = os.fstat(f.fileno()).st_size
+        magic = f.read(len(MAGIC_HEADER))
+        if magic == MAGIC_HEADER:
+            if size < len(MAGIC_HEADER) + HASH_SIZE + 16:
+                raise ValueError("文件结构异常")
+            if (size - len(MAGIC_HEADER) - HASH_SIZE) % 16:
+                raise ValueError("文件被篡改（长度不一致）")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as raw:
+                return _decrypt_v1(raw)
+        if magic != MAGIC_HEADER_V2:
+            raise ValueError("不是受控文件")
+    if workers > 1:
+        data = _load_parallel(file_path, workers)
+        if data is not None:
+            return data
+    return b"".join(iter_load(file_path))
 
-    if not raw.startswith(MAGIC_HEADER):
-        raise ValueError("不是受控文件")
 
-    if len(raw) < len(MAGIC_HEADER) + HASH_SIZE + 16:
-        raise ValueError("文件结构异常")
+def _cache_key(file_path: str) -> tuple:
+    """生成解密结果缓存的键：(绝对路径, 修改时间, 文件大小, 文件头)"""
+    with open(file_path, "rb") as f:
+        st = os.fstat(f.fileno())
+        header = f.read(len(MAGIC_HEADER_V2) + _V2_HEADER.size)
+    return os.path.abspath(file_path), st.st_mtime_ns, st.st_size, header
 
-    encrypted_data = raw[len(MAGIC_HEADER) : -HASH_SIZE]
-    hash_stored = raw[-HASH_SIZE:]
 
-    expected_length = len(MAGIC_HEADER) + len(encrypted_data) + HASH_SIZE
-    if len(raw) != expected_length:
-        raise ValueError("文件被篡改（长度不一致）")
+def _cache_purge():
+    """清理过期条目（调用方须持有 _cache_lock），仍有条目时按最早的过期时间重新安排定时清理"""
+    global _cache_timer
+    now = time.monotonic()
+    for k in [k for k, (expires, _) in _cache.items() if expires <= now]:
+        del _cache[k]
+    if _cache_timer is not None:
+        _cache_timer.cancel()
+        _cache_timer = None
+    if _cache:
+        delay = min(expires for expires, _ in _cache.values()) - now
+        _cache_timer = threading.Timer(max(delay, 0.0) + 0.1, _cache_expire)
+        _cache_timer.daemon = True
+        _cache_timer.start()
 
-    try:
-        cipher = SM4(iv=IV, key=KEY)
-        decrypted = cipher.decrypt(encrypted_data)
-    except Exception:
-        raise ValueError("文件被篡改（解密失败）")
 
-    sm3 = SM3()
-    hash_calculated = sm3.hash(decrypted)
-    if hash_calculated != hash_stored:
-        raise ValueError("文件被篡改（哈希校验失败）")
+def _cache_expire():
+    with _cache_lock:
+        _cache_purge()
+
+
+def _cache_pop(key: tuple):
+    """取出（并移除）缓存的明文，同时清理过期条目；未命中时返回 None"""
+    with _cache_lock:
+        entry = _cache.pop(key, None)
+        _cache_purge()
+    if entry is None or entry[0] <= time.monotonic():
+        return None
+    return entry[1]
+
+
+def _cache_put(key: tuple, data: bytes):
+    """缓存明文，超出条目数或总字节上限时淘汰最早加入的条目；单个明文超过上限时不缓存"""
+    with _cache_lock:
+        _cache.pop(key, None)
+        if len(data) <= _CACHE_MAX_BYTES:
+            total = sum(len(entry[1]) for entry in _cache.values())
+            while _cache and (len(_cache) >= _CACHE_MAX_ENTRIES or total + len(data) > _CACHE_MAX_BYTES):
+                total -= len(_cache.pop(next(iter(_cache)))[1])
+            _cache[key] = (time.monotonic() + _CACHE_TTL, data)
+        _cache_purge()
+
+
+def clear_cache():
+    """清空解密结果缓存"""
+    global _cache_timer
+    with _cache_lock:
+        _cache.clear()
+        if _cache_timer is not None:
+            _cache_timer.cancel()
+            _cache_timer = None
+
+
+def verify_file(file_path: str, cache: bool = True, workers: int = 1):
+    """
+    校验受控文件的结构与完整性（认证标签/哈希），不解码文本
+
+    校验过程中得到的明文会在进程内短暂缓存（最长 _CACHE_TTL 秒，过大的明文不缓存），
+    随后对同一文件（未被修改）调用 load_file 时直接复用，无需再次解密与哈希。
+
+    :param file_path: 文件路径
+    :param cache: 是否缓存解密结果
+    :param workers: 工作进程数，大于 1 时带索引的分块格式文件按分块区间并行校验
+    :raises ValueError: 文件不是受控文件或被篡改或格式异常
+    """
+    key = _cache_key(file_path)
+    data = _load_bytes(file_path, workers)
+    # 校验期间文件被修改时不缓存
+    if cache and _cache_key(file_path) == key:
+        _cache_put(key, data)
+
+
+def load_file(file_path: str, workers: int = 1) -> str:
+    """
+    加载并解密受控文件，验证哈希，返回原始文本内容（支持分块格式与旧格式）
+
+    若此前 verify_file 已校验过同一文件且文件未被修改，直接使用缓存的解密结果。
+
+    :param file_path: 文件路径
+    :param workers: 未命中缓存时解密使用的工作进程数，见 verify_file
+    :return: 解密后的字符串内容
+    :raises ValueError: 文件不是受控文件或被篡改或格式异常
+    """
+    data = _cache_pop(_cache_key(file_path))
+    if data is None:
+        data = _load_bytes(file_path, workers)
 
     try:
-        return decrypted.decode("utf-8")
-    except Exception:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
         raise ValueError("文件内容解码失败（可能被破坏）")
 
 
+def recover_file(file_path: str) -> int:
+    """
+    恢复上一次未完成的增量保存：确认文件末尾只是未写完的追加数据后将其截掉，
+    文件回到上一次成功保存的内容，并写入审计日志
+
+    :param file_path: 文件路径
+    :return: 截掉的字节数；文件没有未完成的保存时返回 0
+    :raises ValueError: 文件不是受控文件或被篡改或格式异常（此时不修改文件）
+    """
+    with open(file_path, "r+b") as f:
+        size = os.fstat(f.fileno()).st_size
+        magic = f.read(len(MAGIC_HEADER_V2))
+        if magic != MAGIC_HEADER_V2:
+            if magic[: len(MAGIC_HEADER)] != MAGIC_HEADER:
+                raise ValueError("不是受控文件")
+            return 0
+        header, flags, chunk_size = _read_v2_header(f)
+        if not flags & _FLAG_INDEX:
+            return 0
+        gcm = backend.sm4_gcm(KEY)
+        end = _read_index(f, gcm, header, flags, chunk_size, size, recover=True).end
+        if end == size:
+            return 0
+        f.truncate(end)
+        f.flush()
+        os.fsync(f.fileno())
+    write_log("恢复文件", file_path, f"成功（截掉未完成保存的 {size - end} 字节）")
+    return size - end
+
+
 def save_file(file_path: str, plaintext: str):
     """
     保存明文为受控加密文件，包括加密和哈希校验
 
+    文本按分片编码，每个分片在仍驻留缓存时完成加密与哈希并直接写入文件，
+    不再生成完整的编码结果、密文与拼接后的文件内容副本。
+    数据先写入临时文件，全部完成后再替换目标文件。
+
     :param file_path: 要保存的目标路径
     :param plaintext: 要保存的明文内容
     """
-    data = plaintext.encode("utf-8")
-    cipher = SM4(iv=IV, key=KEY)
-    encrypted = cipher.encrypt(data)
+    encryptor = backend.sm4(IV, KEY).encryptor()
+    hasher = backend.sm3().hasher()
+
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC_HEADER)
+            for i in range(0, len(plaintext), _PIPELINE_SIZE):
+                chunk = plaintext[i : i + _PIPELINE_SIZE].encode("utf-8")
+                hasher.update(chunk)
+                f.write(encryptor.update(chunk))
+            f.write(encryptor.finalize())
+            f.write(hasher.digest())
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _rechunk(pieces: Iterable[Union[bytes, str]], chunk_size: int) -> Iterator[bytes]:
+    """
+    将任意长度的数据片段重新切分为固定大小的分块（最后一块可能较短）
+
+    :param pieces: 数据片段，str 按 UTF-8 编码
+    :param chunk_size: 分块大小
+    :return: 分块迭代器
+    """
+    buffer = bytearray()
+    for piece in pieces:
+        if isinstance(piece, str):
+            piece = piece.encode("utf-8")
+        view = memoryview(piece).cast("B")
+        if buffer:
+            take = chunk_size - len(buffer)
+            buffer += view[:take]
+            view = view[take:]
+            if len(buffer) < chunk_size:
+                continue
+            yield bytes(buffer)
+            buffer = bytearray()
+        full = len(view) - len(view) % chunk_size
+        for i in range(0, full, chunk_size):
+            yield view[i : i + chunk_size]
+        buffer += view[full:]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _compress(flags: int, data) -> bytes:
+    if flags & _FLAG_ZLIB:
+        return zlib.compress(data, _ZLIB_LEVEL)
+    return lzma.compress(data, preset=_LZMA_PRESET, check=lzma.CHECK_NONE)
+
+
+def _compress_chunk(flags: int, chunk) -> Optional[bytes]:
+    """按文件头指定的算法压缩分块；未启用压缩或数据不可压缩时返回 None"""
+    if not flags & (_FLAG_ZLIB | _FLAG_LZMA) or len(chunk) < _MIN_COMPRESS_SIZE:
+        return None
+    if len(chunk) > 2 * _SAMPLE_SIZE:
+        sample = chunk[:_SAMPLE_SIZE]
+        if len(_compress(flags, sample)) > len(sample) * (1 - _MIN_SAVING):
+            return None
+    data = _compress(flags, chunk)
+    return data if len(data) <= len(chunk) * (1 - _MIN_SAVING) else None
+
+
+def _decode_chunk(flags: int, kind: int, data: bytes, chunk_size: int) -> bytes:
+    """
+    还原分块明文（按需解压），解压结果不得超过分块大小
+
+    :raises ValueError: 记录类型不符或解压失败
+    """
+    if kind == _KIND_DATA:
+        return data
+    if kind != _KIND_DATA_COMPRESSED or not flags & (_FLAG_ZLIB | _FLAG_LZMA):
+        raise ValueError("文件被篡改（分块顺序异常）")
+    try:
+        if flags & _FLAG_ZLIB:
+            decompressor = zlib.decompressobj()
+            plain = decompressor.decompress(data, chunk_size)
+            complete = decompressor.eof and not decompressor.unconsumed_tail
+        else:
+            decompressor = lzma.LZMADecompressor()
+            plain = decompressor.decompress(data, chunk_size)
+            complete = decompressor.eof
+    except (zlib.error, lzma.LZMAError):
+        complete = False
+    if not complete or decompressor.unused_data:
+        raise ValueError("文件被篡改（解压失败）")
+    return plain
+
+
+def _encode_chunk(gcm, header: bytes, flags: int, chunk_id: int, chunk) -> tuple[bytes, bytes]:
+    """
+    编码一个数据分块，按文件头标志位与压缩判定决定是否先压缩
+
+    :return: (完整的记录字节, 叶子哈希)，叶子哈希按实际存储（可能已压缩）的数据计算
+    """
+    packed = _compress_chunk(flags, chunk)
+    if packed is None:
+        return _pack_record(gcm, header, _KIND_DATA, chunk_id, chunk), leaf_hash(chunk)
+    return _pack_record(gcm, header, _KIND_DATA_COMPRESSED, chunk_id, packed), leaf_hash(packed)
+
+
+def _write_chunk(f, gcm, header: bytes, flags: int, chunk_id: int, chunk) -> tuple[int, bytes]:
+    """
+    写入一个数据分块
+
+    :return: (写入的字节数, 叶子哈希)
+    """
+    record, leaf = _encode_chunk(gcm, header, flags, chunk_id, chunk)
+    f.write(record)
+    return len(record), leaf
+
+
+def _pack_record(gcm, header: bytes, kind: int, chunk_id: int, data) -> bytes:
+    """
+    加密一条记录，文件头与记录头作为关联数据参与认证
 
-    sm3 = SM3()
-    hash_value = sm3.hash(data)
+    :return: 记录头 + 密文 + 认证标签
+    """
+    nonce = os.urandom(12)
+    record = _RECORD.pack(kind, chunk_id, nonce, len(data))
+    return record + gcm.encrypt(data, header + record, iv=nonce)
+
+
+def _write_record(f, gcm, header: bytes, kind: int, chunk_id: int, data) -> int:
+    """
+    加密并写入一条记录
+
+    :return: 写入的字节数
+    """
+    record = _pack_record(gcm, header, kind, chunk_id, data)
+    f.write(record)
+    return len(record)
+
+
+# 并行保存时工作进程内复用的 SM4-GCM 实例
+_worker_gcm = None
+
+
+def _encode_in_worker(header: bytes, flags: int, chunk_id: int, chunk: bytes) -> tuple[bytes, bytes]:
+    """在工作进程中编码一个数据分块"""
+    global _worker_gcm
+    if _worker_gcm is None:
+        _worker_gcm = backend.sm4_gcm(KEY)
+    return _encode_chunk(_worker_gcm, header, flags, chunk_id, chunk)
+
+
+def _encoded_chunks(gcm, header: bytes, flags: int, chunks: Iterator, workers: int) -> Iterator[tuple[bytes, bytes, int]]:
+    """
+    按顺序编码各数据分块，workers 大于 1 时按批分发到进程池并行压缩、加密并计算叶子哈希
+
+    进程池在第一批分块凑满后才启动，不足一批的小文件仍在当前进程中处理。
+
+    :return: (记录字节, 叶子哈希, 明文长度) 的迭代器
+    """
+    batch_size = workers * _CHUNKS_PER_WORKER if workers > 1 else 1
+    chunk_id = 0
+    pool = None
+    try:
+        while True:
+            batch = [bytes(chunk) for chunk in itertools.islice(chunks, batch_size)]
+            if not batch:
+                return
+            ids = range(chunk_id, chunk_id + len(batch))
+            chunk_id += len(batch)
+            if pool is None and batch_size > 1 and len(batch) == batch_size:
+                pool = ProcessPoolExecutor(max_workers=workers)
+            if pool is None:
+                encoded = [_encode_chunk(gcm, header, flags, i, chunk) for i, chunk in zip(ids, batch)]
+            else:
+                repeat = itertools.repeat
+                encoded = pool.map(_encode_in_worker, repeat(header), repeat(flags), ids, batch)
+            for (record, leaf), chunk in zip(encoded, batch):
+                yield record, leaf, len(chunk)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
 
-    with open(file_path, "wb") as f:
-        f.write(MAGIC_HEADER + encrypted + hash_value)
+
+def _read_record(f, gcm, header: bytes, limit: int) -> tuple[int, int, bytes]:
+    """
+    读取并解密一条记录
+
+    :param limit: 允许的最大密文长度，防止被篡改的长度字段导致过量读取
+    :return: (类型, 分块序号, 明文)
+    :raises ValueError: 记录不完整或认证失败
+    """
+    record = f.read(_RECORD.size)
+    if len(record) != _RECORD.size:
+        raise ValueError("文件被篡改（结构不完整）")
+    kind, chunk_id, nonce, length = _RECORD.unpack(record)
+    if length > limit:
+        raise ValueError("文件被篡改（分块长度异常）")
+    body = f.read(length + TAG_SIZE)
+    if len(body) != length + TAG_SIZE:
+        raise ValueError("文件被篡改（结构不完整）")
+    try:
+        return kind, chunk_id, gcm.decrypt(body, header + record, iv=nonce)
+    except ValueError:
+        raise ValueError("文件被篡改（认证失败）")
+
+
+def _write_trailer(
+    f,
+    gcm,
+    header: bytes,
+    serial: int,
+    offset: int,
+    index: list[tuple[int, int]],
+    leaves: list[bytes],
+    total: int,
+):
+    """
+    在 offset 处写入尾部记录（分块数、总长、根哈希、叶子哈希与分块索引）和文件尾
+
+    :param serial: 尾部记录的记录序号
+    :param index: 各分块的 (记录偏移, 明文起始偏移)
+    """
+    root = merkle_root(leaves or [leaf_hash(b"")])
+    trailer = [_TRAILER.pack(len(leaves), total, root)]
+    trailer += leaves
+    trailer += [_INDEX_ENTRY.pack(record, start) for record, start in index]
+    _write_record(f, gcm, header, _KIND_TRAILER, serial, b"".join(trailer))
+    f.write(_FOOTER.pack(offset, END_MAGIC))
+
+
+def stream_save(
+    file_path: str,
+    pieces: Iterable[Union[bytes, str]],
+    chunk_size: int = CHUNK_SIZE,
+    compression: Optional[str] = None,
+    workers: Optional[int] = None,
+):
+    """
+    以分块格式（NPUSECENC002）流式保存受控文件，内存占用只与分块大小有关
+
+    数据先写入临时文件，全部完成后再替换目标文件，中途失败不会破坏原文件。
+
+    :param file_path: 要保存的目标路径
+    :param pieces: 明文数据片段（bytes 或 str，str 按 UTF-8 编码），可为任意迭代器
+    :param chunk_size: 分块大小
+    :param compression: 加密前的压缩算法（zlib / lzma），为 None 时不压缩
+    :param workers: 并行编码分块的工作进程数；默认在使用纯 Python 密码后端时取 CPU 核数，
+        使用原生后端时为 1（原生后端加密速度远高于进程间传递数据的开销）
+    """
+    flags = _FLAG_INDEX
+    if compression is not None:
+        if compression not in COMPRESSION_FLAGS:
+            raise ValueError(f"不支持的压缩算法：{compression}")
+        flags |= COMPRESSION_FLAGS[compression]
+    header = MAGIC_HEADER_V2 + _V2_HEADER.pack(flags, chunk_size, os.urandom(16))
+    # 每条记录单独指定随机 nonce
+    gcm = backend.sm4_gcm(KEY)
+    if workers is None:
+        workers = (os.cpu_count() or 1) if backend.SM4_GCM_BACKEND == "python" else 1
+    leaves = []
+    index = []
+    total = 0
+
+    tmp_path = file_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(header)
+            offset = len(header)
+            chunks = _rechunk(pieces, chunk_size)
+            for record, leaf, length in _encoded_chunks(gcm, header, flags, chunks, workers):
+                index.append((offset, total))
+                f.write(record)
+                offset += len(record)
+                leaves.append(leaf)
+                total += length
+
+            _write_trailer(f, gcm, header, len(leaves), offset, index, leaves, total)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _parse_trailer(data: bytes, flags: int) -> tuple[int, bytes, list[bytes], list[tuple[int, int]]]:
+    """
+    解析尾部记录的明文
+
+    :return: (明文总长, 根哈希, 叶子哈希列表, 分块索引列表；无索引时为空列表)
+    :raises ValueError: 尾部记录结构与分块数不符
+    """
+    if len(data) < _TRAILER.size:
+        raise ValueError("文件被篡改（结构不完整）")
+    count, total, root = _TRAILER.unpack_from(data)
+    entry_size = HASH_SIZE + (_INDEX_ENTRY.size if flags & _FLAG_INDEX else 0)
+    if len(data) != _TRAILER.size + count * entry_size:
+        raise ValueError("文件被篡改（结构不完整）")
+    end = _TRAILER.size + count * HASH_SIZE
+    leaves = [data[i : i + HASH_SIZE] for i in range(_TRAILER.size, end, HASH_SIZE)]
+    index = list(_INDEX_ENTRY.iter_unpack(data[end:])) if flags & _FLAG_INDEX else []
+    return total, root, leaves, index
+
+
+def _read_v2_header(f) -> tuple[bytes, int, int]:
+    """
+    读取分块格式文件头中魔数之后的部分
+
+    :return: (完整文件头, 标志位, 分块大小)
+    """
+    fields = f.read(_V2_HEADER.size)
+    if len(fields) != _V2_HEADER.size:
+        raise ValueError("文件结构异常")
+    flags, chunk_size, _ = _V2_HEADER.unpack(fields)
+    if flags & ~_KNOWN_FLAGS:
+        raise ValueError("不支持的文件格式版本")
+    return MAGIC_HEADER_V2 + fields, flags, chunk_size
+
+
+def _iter_load_v1(f, size: int) -> Iterator[bytes]:
+    """
+    流式解密旧格式（NPUSECENC001）文件
+
+    旧格式只在文件末尾保存整体哈希，因此哈希校验失败会在迭代结束时才抛出。
+    """
+    if size < len(MAGIC_HEADER) + HASH_SIZE + 16:
+        raise ValueError("文件结构异常")
+    remaining = size - len(MAGIC_HEADER) - HASH_SIZE
+    if remaining % 16:
+        raise ValueError("文件被篡改（长度不一致）")
+
+    decryptor = backend.sm4(IV, KEY).decryptor()
+    hasher = backend.sm3().hasher()
+    try:
+        while remaining:
+            data = f.read(min(_READ_SIZE, remaining))
+            if not data:
+                raise ValueError("文件被篡改（长度不一致）")
+            remaining -= len(data)
+            plain = decryptor.update(data)
+            hasher.update(plain)
+            yield plain
+        plain = decryptor.finalize()
+    except ValueError as e:
+        if "篡改" in str(e):
+            raise
+        raise ValueError("文件被篡改（解密失败）")
+    hasher.update(plain)
+    if hasher.digest() != f.read(HASH_SIZE):
+        raise ValueError("文件被篡改（哈希校验失败）")
+    yield plain
+
+
+@dataclass
+class _ChunkIndex:
+    """带索引的分块格式文件的分块索引（来自已校验的尾部记录）"""
+
+    header: bytes
+    flags: int
+    chunk_size: int
+    # 各分块记录在文件中的偏移
+    records: list[int]
+    # 各分块的明文起始偏移，末尾追加明文总长
+    starts: list[int]
+    # 各分块的 SM3 叶子哈希
+    leaves: list[bytes]
+    # 当前尾部记录的偏移
+    trailer_offset: int
+    # 下一个可用的记录序号
+    serial: int
+    # 有效内容的末尾（文件尾之后的偏移）；恢复未完成的保存时，其后为需要截掉的数据
+    end: int
+    # 各分块记录在文件中占用的字节数（含记录头与认证标签），增量保存时按需读取
+    sizes: Optional[list[int]] = None
+
+
+def _record_sizes(f, index: _ChunkIndex) -> list[int]:
+    """读取各分块记录头中的密文长度，返回各记录占用的字节数"""
+    sizes = []
+    for offset in index.records:
+        f.seek(offset)
+        record = f.read(_RECORD.size)
+        if len(record) != _RECORD.size:
+            raise ValueError("文件被篡改（结构不完整）")
+        sizes.append(_RECORD.size + _RECORD.unpack(record)[3] + TAG_SIZE)
+    return sizes
+
+
+def _read_index(
+    f, gcm, header: bytes, flags: int, chunk_size: int, size: int, recover: bool = False
+) -> _ChunkIndex:
+    """
+    经文件尾定位并解密尾部记录，校验根哈希与分块索引
+
+    增量保存在追加过程中被中断（进程被终止、断电）时，文件末尾会残留未写完的记录，
+    而上一次保存的尾部记录与文件尾仍完好。只有最后一个有效文件尾之后的数据确实是未写完的追加
+    （见 _unfinished_append）时才视为保存未完成，否则按篡改处理。
+
+    :param recover: 保存未完成时返回上一次成功保存的分块索引，而不是抛出 IncompleteSaveError
+    :raises IncompleteSaveError: 上一次增量保存未完成
+    :raises ValueError: 文件被篡改或结构不完整
+    """
+    try:
+        return _read_index_at(f, gcm, header, flags, chunk_size, size)
+    except ValueError as e:
+        error = e
+    for end in _footer_candidates(f, len(header), size):
+        try:
+            index = _read_index_at(f, gcm, header, flags, chunk_size, end)
+        except ValueError:
+            continue
+        if not _unfinished_append(f, gcm, index, end, size):
+            break
+        if recover:
+            return index
+        raise IncompleteSaveError(end, size)
+    raise error
+
+
+def _footer_candidates(f, start: int, size: int) -> Iterator[int]:
+    """从后向前查找 END_MAGIC，依次产出其后的偏移（即可能的有效内容末尾，不含 size 本身）"""
+    hi = size
+    while hi > start:
+        lo = max(start, hi - _READ_SIZE)
+        f.seek(lo)
+        # 多读 len(END_MAGIC) - 1 字节，使跨越块边界的 END_MAGIC 也能找到
+        block = f.read(min(size, hi + len(END_MAGIC) - 1) - lo)
+        i = block.rfind(END_MAGIC)
+        while i >= 0:
+            if lo + i + len(END_MAGIC) < size:
+                yield lo + i + len(END_MAGIC)
+            i = block.rfind(END_MAGIC, 0, i + len(END_MAGIC) - 1)
+        hi = lo
+
+
+def _unfinished_append(f, gcm, index: _ChunkIndex, start: int, size: int) -> bool:
+    """
+    判断 [start, size) 是否为在 index 之后的一次未写完的增量保存：若干条完整且能通过认证的分块记录，
+    其后至多跟一条被截断的记录，或一条完整的尾部记录加上不完整的文件尾；
+    各记录的序号依次接续 index.serial（被截断的记录头也逐字节比对类型与序号）
+
+    写完的文件尾、无法认证的完整记录、序号或长度不符的记录以及任何其他结构都说明数据被篡改，返回 False。
+    """
+    header = index.header
+    serial = index.serial
+    # 新的尾部记录最多引用原有分块与本次追加的全部分块
+    count = len(index.records)
+    entry_size = HASH_SIZE + _INDEX_ENTRY.size
+    offset = start
+    while offset < size:
+        f.seek(offset)
+        record = f.read(_RECORD.size)
+        if record[0] not in (_KIND_DATA, _KIND_DATA_COMPRESSED, _KIND_TRAILER):
+            return False
+        if not serial.to_bytes(8, "big").startswith(record[1:9]):
+            return False
+        if len(record) < _RECORD.size:
+            return True
+        kind, _, _, length = _RECORD.unpack(record)
+        if kind == _KIND_TRAILER:
+            chunks, rest = divmod(length - _TRAILER.size, entry_size)
+            if rest or not 0 <= chunks <= count:
+                return False
+        elif kind not in (_KIND_DATA, _KIND_DATA_COMPRESSED) or not 0 < length <= index.chunk_size:
+            return False
+        if offset + _RECORD.size + length + TAG_SIZE > size:
+            return True
+        f.seek(offset)
+        try:
+            _read_record(f, gcm, header, length)
+        except ValueError:
+            return False
+        if kind == _KIND_TRAILER:
+            tail = f.read()
+            return len(tail) < _FOOTER.size and _FOOTER.pack(offset, END_MAGIC).startswith(tail)
+        count += 1
+        serial += 1
+        offset = f.tell()
+    return True
+
+
+def _read_index_at(f, gcm, header: bytes, flags: int, chunk_size: int, size: int) -> _ChunkIndex:
+    """以 size 为文件末尾读取并校验分块索引，见 _read_index"""
+    if size < len(header) + _FOOTER.size:
+        raise ValueError("文件被篡改（结构不完整）")
+    f.seek(size - _FOOTER.size)
+    offset, magic = _FOOTER.unpack(f.read(_FOOTER.size))
+    if magic != END_MAGIC or not len(header) <= offset < size - _FOOTER.size:
+        raise ValueError("文件被篡改（结构不完整）")
+
+    f.seek(offset)
+    kind, serial, data = _read_record(f, gcm, header, size)
+    if kind != _KIND_TRAILER or f.tell() != size - _FOOTER.size:
+        raise ValueError("文件被篡改（结构不完整）")
+    total, root, leaves, index = _parse_trailer(data, flags)
+    if root != merkle_root(leaves or [leaf_hash(b"")]):
+        raise ValueError("文件被篡改（哈希校验失败）")
+
+    starts = [start for _, start in index] + [total]
+    records = [record for record, _ in index]
+    if (
+        starts[0] != 0
+        or any(not 0 < b - a <= chunk_size for a, b in zip(starts, starts[1:]))
+        or any(not len(header) <= record < offset for record in records)
+    ):
+        raise ValueError("文件被篡改（分块索引不一致）")
+    return _ChunkIndex(header, flags, chunk_size, records, starts, leaves, offset, serial + 1, size)
+
+
+def _read_chunk(f, gcm, index: _ChunkIndex, i: int) -> bytes:
+    """
+    读取并解密第 i 个分块，校验认证标签、长度与叶子哈希
+
+    :raises ValueError: 分块被篡改
+    """
+    f.seek(index.records[i])
+    kind, _, data = _read_record(f, gcm, index.header, index.chunk_size)
+    if leaf_hash(data) != index.leaves[i]:
+        raise ValueError("文件被篡改（哈希校验失败）")
+    data = _decode_chunk(index.flags, kind, data, index.chunk_size)
+    if len(data) != index.starts[i + 1] - index.starts[i]:
+        raise ValueError("文件被篡改（哈希校验失败）")
+    return data
+
+
+def _read_chunk_range(file_path: str, index: _ChunkIndex, lo: int, hi: int) -> bytes:
+    """工作进程入口：读取并校验第 lo 至 hi - 1 个分块，返回拼接后的明文"""
+    with open(file_path, "rb") as f:
+        gcm = backend.sm4_gcm(KEY)
+        return b"".join(_read_chunk(f, gcm, index, i) for i in range(lo, hi))
+
+
+def _iter_load_v2(f, size: int) -> Iterator[bytes]:
+    """
+    流式解密分块格式（NPUSECENC002）文件
+
+    带索引的文件先校验尾部记录，再按索引顺序读取分块，每个分块在产出前都已通过认证标签与
+    叶子哈希校验。不带索引的文件按物理顺序读取，分块数量、总长度与根哈希在读到尾部记录时校验，
+    文件被截断时会在迭代结束时抛出异常。
+    """
+    header, flags, chunk_size = _read_v2_header(f)
+    gcm = backend.sm4_gcm(KEY)
+
+    if flags & _FLAG_INDEX:
+        index = _read_index(f, gcm, header, flags, chunk_size, size)
+        for i in range(len(index.records)):
+            yield _read_chunk(f, gcm, index, i)
+        return
+
+    leaves = []
+    total = 0
+    while True:
+        offset = f.tell()
+        kind, chunk_id, data = _read_record(f, gcm, header, max(chunk_size, size))
+        if kind == _KIND_TRAILER:
+            break
+        leaf = leaf_hash(data)
+        data = _decode_chunk(flags, kind, data, chunk_size)
+        if chunk_id != len(leaves) or len(data) > chunk_size:
+            raise ValueError("文件被篡改（分块顺序异常）")
+        leaves.append(leaf)
+        total += len(data)
+        yield data
+
+    length, root, stored_leaves, _ = _parse_trailer(data, flags)
+    if (
+        chunk_id != len(leaves)
+        or length != total
+        or stored_leaves != leaves
+        or root != merkle_root(leaves or [leaf_hash(b"")])
+    ):
+        raise ValueError("文件被篡改（哈希校验失败）")
+
+    footer = f.read(_FOOTER.size)
+    if len(footer) != _FOOTER.size or _FOOTER.unpack(footer) != (offset, END_MAGIC) or f.read(1):
+        raise ValueError("文件被篡改（结构不完整）")
+
+
+def iter_load(file_path: str) -> Iterator[bytes]:
+    """
+    流式加载受控文件，逐块产出解密后的明文（bytes），内存占用与文件大小无关
+
+    同时支持分块格式（NPUSECENC002）与旧格式（NPUSECENC001）。
+    任何校验失败都会抛出 ValueError；完整性的最终确认发生在迭代正常结束时，
+    调用方应在迭代完成后再信任已读取的全部内容。
+
+    :param file_path: 文件路径
+    :return: 明文分块迭代器
+    :raises ValueError: 文件不是受控文件或被篡改或格式异常
+    """
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        magic = f.read(len(MAGIC_HEADER))
+        if magic == MAGIC_HEADER_V2:
+            yield from _iter_load_v2(f, size)
+        elif magic == MAGIC_HEADER:
+            yield from _iter_load_v1(f, size)
+        else:
+            raise ValueError("不是受控文件")
+
+
+class SecureFile(io.RawIOBase):
+    """
+    受控文件的只读随机访问视图，提供 seek()/tell()/read()/readline()，读取的是解密后的明文字节
+
+    对带分块索引的分块格式文件，打开时只解密并校验尾部记录（叶子哈希、根哈希与分块索引），
+    之后每次读取只解密、校验所涉及的分块（认证标签 + 叶子哈希），读取量与文件大小无关。
+    旧格式或不带索引的文件无法随机访问，打开时整体解密到内存。
+
+    可用 io.TextIOWrapper 包装后按文本读取。
+    """
+
+    def __init__(self, file_path: str):
+        super().__init__()
+        self.name = file_path
+        self._f = open(file_path, "rb")
+        self._pos = 0
+        # 最近一次解密的分块：(分块序号, 明文)
+        self._cached = (-1, b"")
+        try:
+            self._open()
+        except BaseException:
+            self._f.close()
+            raise
+
+    def _open(self):
+        f = self._f
+        size = os.fstat(f.fileno()).st_size
+        magic = f.read(len(MAGIC_HEADER))
+        if magic == MAGIC_HEADER_V2:
+            header, flags, chunk_size = _read_v2_header(f)
+            if flags & _FLAG_INDEX:
+                self._gcm = backend.sm4_gcm(KEY)
+                self._index = _read_index(f, self._gcm, header, flags, chunk_size, size)
+                self._starts = self._index.starts
+                return
+        elif magic != MAGIC_HEADER:
+            raise ValueError("不是受控文件")
+
+        data = b"".join(iter_load(self.name))
+        self._index = None
+        self._starts = [0, len(data)]
+        self._cached = (0, data)
+
+    def _chunk(self, i: int) -> bytes:
+        """解密并校验第 i 个分块"""
+        if self._cached[0] != i:
+            self._cached = (i, _read_chunk(self._f, self._gcm, self._index, i))
+        return self._cached[1]
+
+    def _locate(self, pos: int) -> int:
+        """返回包含明文偏移 pos 的分块序号"""
+        return bisect.bisect_right(self._starts, pos, hi=len(self._starts) - 1) - 1
+
+    @property
+    def size(self) -> int:
+        """明文总长度"""
+        return self._starts[-1]
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        self._checkClosed()
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._checkClosed()
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.size
+        elif whence != io.SEEK_SET:
+            raise ValueError("不支持的 whence 参数")
+        if offset < 0:
+            raise ValueError("偏移不能为负数")
+        self._pos = offset
+        return offset
+
+    def read(self, size: int = -1) -> bytes:
+        self._checkClosed()
+        end = self.size if size is None or size < 0 else min(self.size, self._pos + size)
+        parts = []
+        while self._pos < end:
+            i = self._locate(self._pos)
+            start = self._starts[i]
+            chunk = self._chunk(i)
+            parts.append(chunk[self._pos - start : end - start])
+            self._pos = min(end, start + len(chunk))
+        return b"".join(parts)
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(memoryview(buffer).cast("B")))
+        memoryview(buffer).cast("B")[: len(data)] = data
+        return len(data)
+
+    def readline(self, size: int = -1) -> bytes:
+        self._checkClosed()
+        end = self.size if size is None or size < 0 else min(self.size, self._pos + size)
+        parts = []
+        while self._pos < end:
+            i = self._locate(self._pos)
+            start = self._starts[i]
+            chunk = self._chunk(i)
+            stop = min(end, start + len(chunk))
+            newline = chunk.find(b"\n", self._pos - start, stop - start)
+            if newline >= 0:
+                stop = start + newline + 1
+            parts.append(chunk[self._pos - start : stop - start])
+            self._pos = stop
+            if newline >= 0:
+                break
+        return b"".join(parts)
+
+    def close(self):
+        if not self.closed:
+            self._f.close()
+            self._cached = (-1, b"")
+        super().close()
+
+
+def _common_prefix(a: bytes, b: bytes, limit: int) -> int:
+    """返回 a 与 b 公共前缀的长度（不超过 limit），先按分片整体比较再二分定位"""
+    i = 0
+    while i < limit:
+        step = min(_PIPELINE_SIZE, limit - i)
+        if a[i : i + step] == b[i : i + step]:
+            i += step
+            continue
+        lo, hi = 0, step
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if a[i : i + mid] == b[i : i + mid]:
+                lo = mid
+            else:
+                hi = mid - 1
+        return i + lo
+    return limit
+
+
+def _common_suffix(a: bytes, b: bytes, limit: int) -> int:
+    """返回 a 与 b 公共后缀的长度（不超过 limit）"""
+    i = 0
+    while i < limit:
+        step = min(_PIPELINE_SIZE, limit - i)
+        if a[len(a) - i - step : len(a) - i] == b[len(b) - i - step : len(b) - i]:
+            i += step
+            continue
+        lo, hi = 0, step
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if a[len(a) - i - mid : len(a) - i] == b[len(b) - i - mid : len(b) - i]:
+                lo = mid
+            else:
+                hi = mid - 1
+        return i + lo
+    return limit
+
+
+def _open_index(file_path: str) -> Optional[_ChunkIndex]:
+    """读取带索引的分块格式文件的分块索引；旧格式或不带索引的文件返回 None"""
+    with open(file_path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if f.read(len(MAGIC_HEADER_V2)) != MAGIC_HEADER_V2:
+            return None
+        header, flags, chunk_size = _read_v2_header(f)
+        if not flags & _FLAG_INDEX:
+            return None
+        gcm = backend.sm4_gcm(KEY)
+        return _read_index(f, gcm, header, flags, chunk_size, size)
+
+
+def _load_parallel(file_path: str, workers: int) -> Optional[bytes]:
+    """
+    在当前进程中校验尾部记录与分块索引，再把分块划分为连续的区间，
+    由各工作进程按索引直接读取文件并解密、校验自己负责的分块
+
+    :return: 明文；旧格式、不带索引或分块数不足以并行的文件返回 None，由调用方顺序读取
+    :raises ValueError: 文件被篡改或结构不完整
+    """
+    index = _open_index(file_path)
+    if index is None or len(index.records) < workers * _CHUNKS_PER_WORKER:
+        return None
+    count = len(index.records)
+    step = -(-count // workers)
+    bounds = [(lo, min(count, lo + step)) for lo in range(0, count, step)]
+    los, his = zip(*bounds)
+    with ProcessPoolExecutor(max_workers=len(bounds)) as pool:
+        repeat = itertools.repeat
+        return b"".join(pool.map(_read_chunk_range, repeat(file_path), repeat(index), los, his))
+
+
+class SecureDocument:
+    """
+    受控文件的编辑会话：记住加载时的明文与分块划分，保存时只重新加密发生变化的分块
+
+    保存时先求新旧明文的公共前缀与公共后缀，完全落在其中的分块原样保留（后缀分块只调整明文偏移），
+    中间的改动区域重新切分、加密后连同新的尾部记录追加到文件末尾，耗时与改动大小成正比。
+    旧格式、不带索引的文件、加载后被外部修改的文件，以及失效数据过多时，改为整体重写。
+    """
+
+    def __init__(
+        self,
+        file_path: str,
+        chunk_size: int = CHUNK_SIZE,
+        compression: Optional[str] = "zlib",
+    ):
+        """
+        :param file_path: 文件路径（新建文件时可以尚不存在）
+        :param chunk_size: 整体重写时使用的分块大小
+        :param compression: 整体重写时使用的压缩算法（增量保存沿用文件原有设置）
+        """
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.compression = compression
+        self._data = b""
+        # 分块索引与对应的文件状态；为 None 时下次保存整体重写
+        self._index: Optional[_ChunkIndex] = None
+        self._key = None
+
+    @classmethod
+    def open(cls, file_path: str) -> "SecureDocument":
+        """
+        加载受控文件并建立编辑会话（若 verify_file 已缓存解密结果则直接复用）
+
+        :param file_path: 文件路径
+        :return: SecureDocument 实例
+        :raises ValueError: 文件不是受控文件或被篡改或格式异常
+        """
+        document = cls(file_path)
+        key = _cache_key(file_path)
+        data = _cache_pop(key)
+        if data is None:
+            data = _load_bytes(file_path)
+        document._data = bytes(data)
+        document._index = _open_index(file_path)
+        document._key = key
+        if document._index is not None:
+            document.chunk_size = document._index.chunk_size
+            if document._index.starts[-1] != len(data) or _cache_key(file_path) != key:
+                document._index = None
+        return document
+
+    @property
+    def text(self) -> str:
+        """当前明文内容"""
+        try:
+            return self._data.decode("utf-8")
+        except UnicodeDecodeError:
+            raise ValueError("文件内容解码失败（可能被破坏）")
+
+    def save(self, plaintext: str) -> int:
+        """
+        保存明文，只重新加密发生变化的分块
+
+        :param plaintext: 要保存的明文内容
+        :return: 重新加密的分块数
+        """
+        data = plaintext.encode("utf-8")
+        index = self._index
+        if (
+            index is None
+            or not os.path.exists(self.file_path)
+            or _cache_key(self.file_path) != self._key
+        ):
+            rewritten = None
+        else:
+            rewritten = self._save_incremental(index, data)
+
+        if rewritten is None:
+            stream_save(self.file_path, [data], self.chunk_size, self.compression)
+            self._index = _open_index(self.file_path)
+            rewritten = len(self._index.records)
+
+        self._data = data
+        self._key = _cache_key(self.file_path)
+        return rewritten
+
+    def _save_incremental(self, index: _ChunkIndex, data: bytes) -> Optional[int]:
+        """追加改动的分块并重新链接索引；需要整体重写时返回 None"""
+        old = self._data
+        if old == data:
+            return 0
+        limit = min(len(old), len(data))
+        prefix = _common_prefix(old, data, limit)
+        suffix = _common_suffix(old, data, limit - prefix)
+        delta = len(data) - len(old)
+        count = len(index.records)
+
+        # 完全落在公共前缀内的分块 [0, head)，完全落在公共后缀内的分块 [tail, count)
+        head = bisect.bisect_right(index.starts, prefix) - 1
+        tail = bisect.bisect_left(index.starts, len(old) - suffix, 0, count)
+        lo = index.starts[head]
+        hi = index.starts[tail] + delta
+
+        # 有效与失效数据都按记录在文件中实际占用的字节数计算（压缩后的分块远小于其明文）
+        if index.sizes is None:
+            with open(self.file_path, "rb") as f:
+                index.sizes = _record_sizes(f, index)
+        kept = list(range(head)) + list(range(tail, count))
+        live = sum(index.sizes[i] for i in kept)
+        end = index.end
+        waste = end - len(index.header) - live
+        pieces = list(_rechunk([memoryview(data)[lo:hi]], index.chunk_size))
+        if (
+            waste > max(live, _COMPACT_MIN_WASTE)
+            or len(kept) + len(pieces) > 2 * (len(data) // index.chunk_size + 1)
+        ):
+            return None
+
+        gcm = backend.sm4_gcm(KEY)
+        records = index.records[:head]
+        starts = index.starts[:head]
+        leaves = index.leaves[:head]
+        sizes = index.sizes[:head]
+        serial = index.serial
+        with open(self.file_path, "r+b") as f:
+            f.seek(end)
+            try:
+                offset = end
+                for piece in pieces:
+                    records.append(offset)
+                    starts.append(lo)
+                    size, leaf = _write_chunk(f, gcm, index.header, index.flags, serial, piece)
+                    offset += size
+                    sizes.append(size)
+                    leaves.append(leaf)
+                    serial += 1
+                    lo += len(piece)
+                records += index.records[tail:count]
+                starts += [start + delta for start in index.starts[tail:]]
+                leaves += index.leaves[tail:count]
+                sizes += index.sizes[tail:count]
+
+                # 分块落盘后再写尾部记录与文件尾：有效的文件尾一定指向完整的分块，
+                # 写入中途中断时读取端报告保存未完成，可由 recover_file 截回上一个文件尾
+                f.flush()
+                os.fsync(f.fileno())
+                _write_trailer(
+                    f, gcm, index.header, serial, offset, list(zip(records, starts)), leaves, len(data)
+                )
+                f.flush()
+                os.fsync(f.fileno())
+                new_end = f.tell()
+            except BaseException:
+                # 只追加不覆盖，截断回原长度即可恢复原文件
+                f.truncate(end)
+                raise
+
+        self._index = _ChunkIndex(
+            index.header, index.flags, index.chunk_size, records, starts, leaves, offset, serial + 1, new_end, sizes
+        )
+        return len(pieces)
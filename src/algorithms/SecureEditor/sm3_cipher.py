@@ -1,60 +1,137 @@
+import struct
+
+import numpy as np
+
 from .base import Cipher
 
-class SM3(Cipher):
-    def __init__(self):
-        self.IV = [
-            0x7380166F, 0x4914B2B9,
-            0x172442D7, 0xDA8A0600,
-            0xA96F30BC, 0x163138AA,
-            0xE38DEE4D, 0xB0FB0E4E
-        ]
+# 初始值 IV
+IV = [
+    0x7380166F, 0x4914B2B9,
+    0x172442D7, 0xDA8A0600,
+    0xA96F30BC, 0x163138AA,
+    0xE38DEE4D, 0xB0FB0E4E
+]
 
-        self.T = [0x79cc4519] * 16 + [0x7a879d8a] * 48
+# 常量 T_j
+T = [0x79cc4519] * 16 + [0x7a879d8a] * 48
 
-    # 常用运算
-    def _rotate_left(self, x, n):
-        return ((x << n) & 0xFFFFFFFF) | (x >> (32 - n))
+# 预先循环左移 j 位的常量 T_j <<< (j mod 32)
+T_ROTATED = [((t << (j % 32)) | (t >> (32 - j % 32))) & 0xFFFFFFFF for j, t in enumerate(T)]
 
-    def _ff(self, x, y, z, j):
-        return (x ^ y ^ z) if j < 16 else ((x & y) | (x & z) | (y & z))
+# 64 字节消息分组与 16 个大端 32 位字之间的转换
+_WORDS = struct.Struct(">16I")
 
-    def _gg(self, x, y, z, j):
-        return (x ^ y ^ z) if j < 16 else ((x & y) | ((~x) & z))
+def _compress(v: list[int], block, w: list[int]) -> list[int]:
+    """
+    展开后的 SM3 压缩函数
 
-    def _p0(self, x):
-        return x ^ self._rotate_left(x, 9) ^ self._rotate_left(x, 17)
+    轮常量预先完成循环移位，布尔函数与置换函数 P0/P1 全部内联，
+    前 16 轮与后 48 轮拆分为两个无分支的循环，W'_j 由 W_j ^ W_{j+4} 就地计算。
 
-    def _p1(self, x):
-        return x ^ self._rotate_left(x, 15) ^ self._rotate_left(x, 23)
+    :param v: 8 个 32 位整数的链接变量
+    :param block: 64 字节的消息分组（bytes-like）
+    :param w: 长度至少为 68 的整数列表，作为消息扩展的工作缓冲区在分组间复用
+    :return: 压缩后的 8 个 32 位整数
+    """
+    w[0:16] = _WORDS.unpack(block)
+    for j in range(16, 68):
+        x = w[j - 16] ^ w[j - 9]
+        y = w[j - 3]
+        x ^= ((y << 15) & 0xFFFFFFFF) | (y >> 17)
+        y = w[j - 13]
+        w[j] = (x ^ (((x << 15) & 0xFFFFFFFF) | (x >> 17)) ^ (((x << 23) & 0xFFFFFFFF) | (x >> 9)) ^
+                (((y << 7) & 0xFFFFFFFF) | (y >> 25)) ^ w[j - 6])
 
-    # 填充消息
-    def _padding(self, message: bytes) -> bytes:
-        """
-        对输入的消息进行填充，使其长度符合 SM3 的要求
+    a, b, c, d, e, f, g, h = v
+    t_rotated = T_ROTATED
+    for j in range(16):
+        a12 = ((a << 12) & 0xFFFFFFFF) | (a >> 20)
+        ss1 = (a12 + e + t_rotated[j]) & 0xFFFFFFFF
+        ss1 = ((ss1 << 7) & 0xFFFFFFFF) | (ss1 >> 25)
+        wj = w[j]
+        tt1 = ((a ^ b ^ c) + d + (ss1 ^ a12) + (wj ^ w[j + 4])) & 0xFFFFFFFF
+        tt2 = ((e ^ f ^ g) + h + ss1 + wj) & 0xFFFFFFFF
+        d = c
+        c = ((b << 9) & 0xFFFFFFFF) | (b >> 23)
+        b = a
+        a = tt1
+        h = g
+        g = ((f << 19) & 0xFFFFFFFF) | (f >> 13)
+        f = e
+        e = tt2 ^ (((tt2 << 9) & 0xFFFFFFFF) | (tt2 >> 23)) ^ (((tt2 << 17) & 0xFFFFFFFF) | (tt2 >> 15))
+    for j in range(16, 64):
+        a12 = ((a << 12) & 0xFFFFFFFF) | (a >> 20)
+        ss1 = (a12 + e + t_rotated[j]) & 0xFFFFFFFF
+        ss1 = ((ss1 << 7) & 0xFFFFFFFF) | (ss1 >> 25)
+        wj = w[j]
+        tt1 = (((a & b) | (a & c) | (b & c)) + d + (ss1 ^ a12) + (wj ^ w[j + 4])) & 0xFFFFFFFF
+        tt2 = ((((f ^ g) & e) ^ g) + h + ss1 + wj) & 0xFFFFFFFF
+        d = c
+        c = ((b << 9) & 0xFFFFFFFF) | (b >> 23)
+        b = a
+        a = tt1
+        h = g
+        g = ((f << 19) & 0xFFFFFFFF) | (f >> 13)
+        f = e
+        e = tt2 ^ (((tt2 << 9) & 0xFFFFFFFF) | (tt2 >> 23)) ^ (((tt2 << 17) & 0xFFFFFFFF) | (tt2 >> 15))
 
-        :param message: 原始消息（bytes）
-        :return: 填充后的消息（bytes）
-        """
-        mlen = len(message) * 8
-        message += b'\x80'
-        message += b'\x00' * ((56 - (len(message) % 64)) % 64)
-        message += mlen.to_bytes(8, 'big')
-        return message
+    return [v[0] ^ a, v[1] ^ b, v[2] ^ c, v[3] ^ d, v[4] ^ e, v[5] ^ f, v[6] ^ g, v[7] ^ h]
 
-    # 消息分组
-    def _message_expand(self, b):
-        """
-        对 512 位（64 字节）的消息分组进行消息扩展，生成 w 和 w' 列表
+# 同一组消息数少于该值时逐条计算，NumPy 的逐轮调用开销只有在多条并行时才能摊薄
+_LANES_MIN = 32
 
-        :param b: 64 字节的消息分组（bytes）
-        :return: 扩展后的 132 个 32 位整数列表 w 和 w'
-        """
-        w = [int.from_bytes(b[i:i + 4], 'big') for i in range(0, 64, 4)]
-        for j in range(16, 68):
-            w.append(self._p1(w[j - 16] ^ w[j - 9] ^ self._rotate_left(w[j - 3], 15)) ^ self._rotate_left(w[j - 13], 7) ^ w[j - 6])
-        for j in range(64):
-            w.append(w[j] ^ w[j + 4])
-        return w
+def _padding(message: bytes) -> bytes:
+    """
+    对输入的消息进行填充，使其长度符合 SM3 的要求
+
+    :param message: 原始消息（bytes）
+    :return: 填充后的消息（bytes）
+    """
+    tail = b'\x80' + b'\x00' * ((55 - len(message)) % 64)
+    return bytes(message) + tail + (len(message) * 8).to_bytes(8, 'big')
+
+def _compress_lanes(v: list[np.ndarray], words: np.ndarray) -> list[np.ndarray]:
+    """
+    多消息并行的 SM3 压缩函数，每条消息占一条 uint32 通道
+
+    :param v: 8 个形状为 (n,) 的 uint32 数组，对应各通道的链接变量
+    :param words: 形状为 (16, n) 的 uint32 数组，对应各通道当前的消息分组
+    :return: 压缩后的 8 个 uint32 数组
+    """
+    def rotl(x, n):
+        return (x << n) | (x >> (32 - n))
+
+    w = list(words)
+    for j in range(16, 68):
+        x = w[j - 16] ^ w[j - 9] ^ rotl(w[j - 3], 15)
+        w.append(x ^ rotl(x, 15) ^ rotl(x, 23) ^ rotl(w[j - 13], 7) ^ w[j - 6])
+
+    a, b, c, d, e, f, g, h = v
+    for j in range(64):
+        a12 = rotl(a, 12)
+        ss1 = rotl(a12 + e + T_ROTATED[j], 7)
+        if j < 16:
+            ff = a ^ b ^ c
+            gg = e ^ f ^ g
+        else:
+            ff = (a & b) | (a & c) | (b & c)
+            gg = ((f ^ g) & e) ^ g
+        tt1 = ff + d + (ss1 ^ a12) + (w[j] ^ w[j + 4])
+        tt2 = gg + h + ss1 + w[j]
+        d = c
+        c = rotl(b, 9)
+        b = a
+        a = tt1
+        h = g
+        g = rotl(f, 19)
+        f = e
+        e = tt2 ^ rotl(tt2, 9) ^ rotl(tt2, 17)
+
+    return [x ^ y for x, y in zip(v, (a, b, c, d, e, f, g, h))]
+
+class SM3(Cipher):
+    def __init__(self):
+        self.IV = IV.copy()
 
     def _cf(self, v, b):
         """
@@ -64,22 +141,7 @@ class SM3(Cipher):
         :param b: 一个64字节的消息分组（bytes）
         :return: 压缩后的8个32位整数（状态变量列表）
         """
-        w = self._message_expand(b)
-        a, b, c, d, e, f, g, h = v
-        for j in range(64):
-            ss1 = self._rotate_left((self._rotate_left(a, 12) + e + self._rotate_left(self.T[j], j % 32)) & 0xFFFFFFFF, 7)
-            ss2 = ss1 ^ self._rotate_left(a, 12)
-            tt1 = (self._ff(a, b, c, j) + d + ss2 + w[j + 68]) & 0xFFFFFFFF
-            tt2 = (self._gg(e, f, g, j) + h + ss1 + w[j]) & 0xFFFFFFFF
-            d = c
-            c = self._rotate_left(b, 9)
-            b = a
-            a = tt1
-            h = g
-            g = self._rotate_left(f, 19)
-            f = e
-            e = self._p0(tt2)
-        return [(x ^ y) & 0xFFFFFFFF for x, y in zip(v, [a, b, c, d, e, f, g, h])]
+        return _compress(v, b, [0] * 68)
 
     def _SM3Hash(self, message: bytes) -> bytes:
         """
@@ -88,12 +150,7 @@ class SM3(Cipher):
         :param message: 要进行哈希的原始消息（bytes）
         :return: 哈希值，长度为32字节（256位）（bytes）
         """
-        message = self._padding(message)
-        v = self.IV.copy()
-        for i in range(0, len(message), 64):
-            v = self._cf(v, message[i:i + 64])
-        result = b''.join(x.to_bytes(4, 'big') for x in v)
-        return result
+        return SM3Hasher(message, sm3=self).digest()
     
     def encrypt(self, message: bytes) -> bytes:
         return self._SM3Hash(message)
@@ -110,6 +167,130 @@ class SM3(Cipher):
         """
         return self._SM3Hash(message)
 
+    def hash_many(self, messages) -> list[bytes]:
+        """
+        批量计算多条消息的 SM3 哈希值
+
+        按填充后的分组数对消息分组，同组消息各占一条 NumPy uint32 通道，
+        压缩函数的每一步同时作用于整组消息，从而摊薄逐条调用的解释器开销。
+
+        :param messages: 消息序列（每条为 bytes-like）
+        :return: 与输入顺序一致的哈希值列表，每个为32字节（bytes）
+        """
+        padded = [_padding(message) for message in messages]
+        groups = {}
+        for index, message in enumerate(padded):
+            groups.setdefault(len(message) // 64, []).append(index)
+
+        digests = [b''] * len(padded)
+        for blocks, indexes in groups.items():
+            if len(indexes) < _LANES_MIN:
+                for index in indexes:
+                    v, w = self.IV, [0] * 68
+                    for i in range(0, len(padded[index]), 64):
+                        v = _compress(v, padded[index][i:i + 64], w)
+                    digests[index] = b''.join(x.to_bytes(4, 'big') for x in v)
+                continue
+
+            # 形状 (块序号, 字序号, 通道)
+            data = b''.join(padded[index] for index in indexes)
+            words = np.frombuffer(data, dtype='>u4').reshape(len(indexes), blocks, 16).transpose(1, 2, 0).astype(np.uint32)
+            v = [np.full(len(indexes), x, dtype=np.uint32) for x in self.IV]
+            for k in range(blocks):
+                v = _compress_lanes(v, words[k])
+            result = np.stack(v, axis=1).astype('>u4').tobytes()
+            for lane, index in enumerate(indexes):
+                digests[index] = result[lane * 32:(lane + 1) * 32]
+        return digests
+
+    def hasher(self, data: bytes = b"") -> "SM3Hasher":
+        """
+        创建增量哈希对象，可分块调用 update()
+
+        :param data: 初始数据（bytes-like）
+        :return: SM3Hasher 实例
+        """
+        return SM3Hasher(data, sm3=self)
+
+class SM3Hasher:
+    """
+    hashlib 风格的增量 SM3 哈希对象
+
+    只保留不足一个分组（64 字节）的尾部数据，完整分组到达后立即压缩，
+    因此对任意长度的数据流都只占用常数内存。
+    """
+
+    name = "sm3"
+    digest_size = 32
+    block_size = 64
+
+    def __init__(self, data: bytes = b"", sm3: SM3 = None):
+        self._sm3 = sm3 if sm3 is not None else SM3()
+        self._state = self._sm3.IV.copy()
+        self._w = [0] * 68
+        self._buffer = bytearray()
+        self._length = 0
+        if data:
+            self.update(data)
+
+    def update(self, data) -> None:
+        """
+        追加数据
+
+        :param data: 待哈希的数据（bytes-like）
+        """
+        data = memoryview(data).cast("B")
+        self._length += len(data)
+        if self._buffer:
+            take = 64 - len(self._buffer)
+            self._buffer += data[:take]
+            data = data[take:]
+            if len(self._buffer) < 64:
+                return
+            self._state = _compress(self._state, self._buffer, self._w)
+
+        state, w = self._state, self._w
+        full = len(data) - len(data) % 64
+        for i in range(0, full, 64):
+            state = _compress(state, data[i:i + 64], w)
+        self._state = state
+        self._buffer = bytearray(data[full:])
+
+    def copy(self) -> "SM3Hasher":
+        """
+        复制当前哈希状态，可用于计算公共前缀数据的多个哈希值
+
+        :return: 新的 SM3Hasher 实例
+        """
+        other = SM3Hasher(sm3=self._sm3)
+        other._state = self._state.copy()
+        other._buffer = self._buffer.copy()
+        other._length = self._length
+        return other
+
+    def digest(self) -> bytes:
+        """
+        计算当前已输入数据的哈希值，不影响后续继续 update()
+
+        :return: 32字节（256位）的哈希值（bytes）
+        """
+        # 仅对尾部数据进行填充：0x80、补零至 56 字节（模 64），再附加 64 位消息比特长度
+        tail = bytes(self._buffer) + b'\x80'
+        tail += b'\x00' * ((56 - len(tail) % 64) % 64)
+        tail += (self._length * 8).to_bytes(8, 'big')
+        v = self._state
+        for i in range(0, len(tail), 64):
+            v = _compress(v, tail[i:i + 64], self._w)
+        return b''.join(x.to_bytes(4, 'big') for x in v)
+
+    def hexdigest(self) -> str:
+        """
+        以十六进制字符串形式返回哈希值
+
+        :return: 64 个字符的十六进制字符串
+        """
+        return self.digest().hex()
+
 if __name__ == '__main__':
     sm3 = SM3()
     message = b'123'
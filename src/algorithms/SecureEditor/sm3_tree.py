@@ -0,0 +1,35 @@
+from . import backend
+
+# 叶子与内部节点使用不同前缀，避免二者的哈希值相互冒充
+_LEAF_PREFIX = b"\x00"
+_NODE_PREFIX = b"\x01"
+
+def leaf_hash(chunk) -> bytes:
+    """
+    计算单个叶子的 SM3 哈希值
+
+    :param chunk: 叶子数据（bytes-like）
+    :return: 32 字节哈希值
+    """
+    hasher = backend.sm3().hasher(_LEAF_PREFIX)
+    hasher.update(chunk)
+    return hasher.digest()
+
+def merkle_root(leaves: list[bytes]) -> bytes:
+    """
+    由叶子哈希逐层两两合并得到根哈希，奇数个节点时最后一个直接提升到上一层
+
+    :param leaves: 叶子哈希列表（至少一个）
+    :return: 32 字节根哈希
+    """
+    if not leaves:
+        raise ValueError("叶子列表不能为空")
+    sm3 = backend.sm3()
+    level = list(leaves)
+    while len(level) > 1:
+        pairs = [_NODE_PREFIX + level[i] + level[i + 1] for i in range(0, len(level) - 1, 2)]
+        parents = sm3.hash_many(pairs)
+        if len(level) % 2:
+            parents.append(level[-1])
+        level = parents
+    return level[0]
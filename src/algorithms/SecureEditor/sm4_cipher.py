@@ -1,5 +1,9 @@
+import struct
+
+import numpy as np
+
 from .base import Cipher
-from .utils import pkcs7_padding, pkcs7_unpadding, xor_bytes
+from .utils import pkcs7_padding, pkcs7_unpadding
 
 # SM4 S盒
 Sbox = [
@@ -52,6 +56,331 @@ CK = [
     0x10171e25, 0x2c333a41, 0x484f565d, 0x646b7279
 ]
 
+def _rotl(x: int, n: int) -> int:
+    """32 位整数循环左移"""
+    return ((x << n) | (x >> (32 - n))) & 0xFFFFFFFF
+
+def _build_t_tables() -> tuple[list[int], list[int], list[int], list[int]]:
+    """
+    预计算合并了 S 盒变换 τ 与线性变换 L 的四张查找表
+
+    由于 τ 按字节独立代换、L 为线性变换，对任意 32 位输入 X 有
+    T(X) = T0[X >> 24] ^ T1[(X >> 16) & 0xFF] ^ T2[(X >> 8) & 0xFF] ^ T3[X & 0xFF]
+
+    :return: 四张 256 项的查找表 (T0, T1, T2, T3)
+    """
+    tables = ([], [], [], [])
+    for x in range(256):
+        for i, table in enumerate(tables):
+            b = Sbox[x] << (24 - 8 * i)
+            table.append(b ^ _rotl(b, 2) ^ _rotl(b, 10) ^ _rotl(b, 18) ^ _rotl(b, 24))
+    return tables
+
+T0, T1, T2, T3 = _build_t_tables()
+
+# 16 字节分组与 4 个大端 32 位字之间的转换
+_BLOCK = struct.Struct(">4I")
+
+def _crypt_words(x0: int, x1: int, x2: int, x3: int, rk: list[int]) -> tuple[int, int, int, int]:
+    """
+    基于 T 表的 SM4 轮函数，32 轮完全展开
+
+    加密与解密共用此函数，解密时传入逆序的轮密钥即可。
+
+    :param x0: 输入分组的第 1 个 32 位字
+    :param x1: 输入分组的第 2 个 32 位字
+    :param x2: 输入分组的第 3 个 32 位字
+    :param x3: 输入分组的第 4 个 32 位字
+    :param rk: 32 轮的轮密钥列表
+    :return: 经反序变换 R 后的 4 个 32 位字
+    """
+    t0, t1, t2, t3 = T0, T1, T2, T3
+    t = x1 ^ x2 ^ x3 ^ rk[0]
+    x0 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x2 ^ x3 ^ x0 ^ rk[1]
+    x1 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x3 ^ x0 ^ x1 ^ rk[2]
+    x2 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x0 ^ x1 ^ x2 ^ rk[3]
+    x3 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x1 ^ x2 ^ x3 ^ rk[4]
+    x0 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x2 ^ x3 ^ x0 ^ rk[5]
+    x1 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x3 ^ x0 ^ x1 ^ rk[6]
+    x2 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x0 ^ x1 ^ x2 ^ rk[7]
+    x3 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x1 ^ x2 ^ x3 ^ rk[8]
+    x0 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x2 ^ x3 ^ x0 ^ rk[9]
+    x1 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x3 ^ x0 ^ x1 ^ rk[10]
+    x2 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x0 ^ x1 ^ x2 ^ rk[11]
+    x3 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x1 ^ x2 ^ x3 ^ rk[12]
+    x0 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x2 ^ x3 ^ x0 ^ rk[13]
+    x1 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x3 ^ x0 ^ x1 ^ rk[14]
+    x2 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x0 ^ x1 ^ x2 ^ rk[15]
+    x3 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x1 ^ x2 ^ x3 ^ rk[16]
+    x0 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x2 ^ x3 ^ x0 ^ rk[17]
+    x1 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x3 ^ x0 ^ x1 ^ rk[18]
+    x2 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x0 ^ x1 ^ x2 ^ rk[19]
+    x3 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x1 ^ x2 ^ x3 ^ rk[20]
+    x0 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x2 ^ x3 ^ x0 ^ rk[21]
+    x1 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x3 ^ x0 ^ x1 ^ rk[22]
+    x2 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x0 ^ x1 ^ x2 ^ rk[23]
+    x3 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x1 ^ x2 ^ x3 ^ rk[24]
+    x0 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x2 ^ x3 ^ x0 ^ rk[25]
+    x1 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x3 ^ x0 ^ x1 ^ rk[26]
+    x2 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x0 ^ x1 ^ x2 ^ rk[27]
+    x3 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x1 ^ x2 ^ x3 ^ rk[28]
+    x0 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x2 ^ x3 ^ x0 ^ rk[29]
+    x1 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x3 ^ x0 ^ x1 ^ rk[30]
+    x2 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    t = x0 ^ x1 ^ x2 ^ rk[31]
+    x3 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+    return x3, x2, x1, x0
+
+def _crypt_block(block: bytes, rk: list[int]) -> bytes:
+    """
+    使用 T 表轮函数处理一个 16 字节分组
+
+    :param block: 16 字节输入分组
+    :param rk: 32 轮的轮密钥列表（解密时为逆序轮密钥）
+    :return: 16 字节输出分组
+    """
+    return _BLOCK.pack(*_crypt_words(*_BLOCK.unpack(block), rk))
+
+# NumPy 版本的 T 表，供多分组并行计算使用
+_NP_T0, _NP_T1, _NP_T2, _NP_T3 = (np.array(table, dtype=np.uint32) for table in (T0, T1, T2, T3))
+
+# 单批处理的分组数，限制临时数组的内存占用（65536 个分组即 1 MiB）
+_BATCH_BLOCKS = 65536
+
+def _crypt_blocks(data, rk: list[int], out) -> None:
+    """
+    基于 NumPy 的多分组 SM4 轮函数，对一批分组同时执行 32 轮变换
+
+    每一轮在整批分组构成的 uint32 数组上完成，S 盒与线性变换通过 T 表的
+    数组索引（gather）实现，适用于分组之间互不依赖的场景（ECB、CTR、CBC 解密）。
+
+    :param data: 输入数据（bytes-like），长度必须是 16 的倍数
+    :param rk: 32 轮的轮密钥列表（解密时为逆序轮密钥）
+    :param out: 可写的输出缓冲区（bytes-like），长度不小于 data
+    """
+    src = np.frombuffer(data, dtype=">u4").reshape(-1, 4)
+    dst = np.frombuffer(out, dtype=">u4", count=src.size).reshape(-1, 4)
+    t0, t1, t2, t3 = _NP_T0, _NP_T1, _NP_T2, _NP_T3
+    for start in range(0, len(src), _BATCH_BLOCKS):
+        words = src[start:start + _BATCH_BLOCKS].T.astype(np.uint32)
+        x0, x1, x2, x3 = words
+        for k in rk:
+            t = x1 ^ x2 ^ x3 ^ k
+            x0 ^= t0[t >> 24] ^ t1[(t >> 16) & 0xFF] ^ t2[(t >> 8) & 0xFF] ^ t3[t & 0xFF]
+            x0, x1, x2, x3 = x1, x2, x3, x0
+        batch = dst[start:start + _BATCH_BLOCKS]
+        batch[:, 0] = x3
+        batch[:, 1] = x2
+        batch[:, 2] = x1
+        batch[:, 3] = x0
+
+def _cbc_encrypt_into(src, dst, rk: list[int], prev: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
+    """
+    CBC 模式加密若干完整分组，结果直接写入输出缓冲区
+
+    :param src: 输入数据（bytes-like），长度必须是 16 的倍数
+    :param dst: 可写的输出缓冲区，长度不小于 src
+    :param rk: 32 轮的轮密钥列表
+    :param prev: 前一个密文分组（首个分组为 IV）的 4 个 32 位字
+    :return: 最后一个密文分组的 4 个 32 位字，用于衔接后续数据
+    """
+    p0, p1, p2, p3 = prev
+    unpack_from, pack_into = _BLOCK.unpack_from, _BLOCK.pack_into
+    for offset in range(0, len(src), 16):
+        w0, w1, w2, w3 = unpack_from(src, offset)
+        p0, p1, p2, p3 = _crypt_words(w0 ^ p0, w1 ^ p1, w2 ^ p2, w3 ^ p3, rk)
+        pack_into(dst, offset, p0, p1, p2, p3)
+    return p0, p1, p2, p3
+
+def _cbc_decrypt_into(src, dst, rk: list[int], prev: bytes) -> None:
+    """
+    CBC 模式批量解密若干完整分组，结果直接写入输出缓冲区
+
+    :param src: 输入数据（bytes-like），长度必须是 16 的倍数
+    :param dst: 可写的输出缓冲区，长度不小于 src
+    :param rk: 逆序的 32 轮轮密钥列表
+    :param prev: 前一个密文分组（首个分组为 IV）
+    """
+    _crypt_blocks(src, rk, dst)
+    plain = np.frombuffer(dst, dtype=np.uint8, count=len(src))
+    plain[:16] ^= np.frombuffer(prev, dtype=np.uint8)
+    plain[16:] ^= np.frombuffer(src, dtype=np.uint8)[:-16]
+
+class SM4Encryptor:
+    """SM4 CBC 模式的增量加密上下文，支持分块输入，仅在 finalize 时进行填充"""
+
+    def __init__(self, round_keys: list[int], iv: bytes):
+        self._round_keys = round_keys
+        self._prev = _BLOCK.unpack(iv)
+        self._buffer = bytearray()
+        self._finalized = False
+
+    def update(self, data) -> bytes:
+        """
+        加密一段任意长度的数据，不足一个分组的部分留待后续数据补齐
+
+        :param data: 明文数据（bytes-like）
+        :return: 本次可输出的密文（bytes），长度为 16 的倍数
+        """
+        pending = len(self._buffer) + memoryview(data).nbytes
+        out = bytearray(pending - pending % 16)
+        self.update_into(data, out)
+        return bytes(out)
+
+    def update_into(self, data, out) -> int:
+        """
+        加密一段任意长度的数据，密文直接写入调用方提供的缓冲区
+
+        :param data: 明文数据（bytes-like）
+        :param out: 可写的输出缓冲区，长度不小于 len(data) + 15
+        :return: 写入 out 的字节数（16 的倍数）
+        """
+        if self._finalized:
+            raise ValueError("加密上下文已结束")
+        data = memoryview(data).cast("B")
+        pending = len(self._buffer) + len(data)
+        size = pending - pending % 16
+        if not size:
+            self._buffer += data
+            return 0
+        out = memoryview(out).cast("B")
+        if len(out) < size:
+            raise ValueError("输出缓冲区长度不足")
+
+        pos = 0
+        if self._buffer:
+            # 先用新数据补齐上次剩余的不完整分组
+            take = 16 - len(self._buffer)
+            self._buffer += data[:take]
+            self._prev = _cbc_encrypt_into(self._buffer, out, self._round_keys, self._prev)
+            data = data[take:]
+            pos = 16
+
+        full = size - pos
+        self._prev = _cbc_encrypt_into(data[:full], out[pos:], self._round_keys, self._prev)
+        self._buffer = bytearray(data[full:])
+        return size
+
+    def finalize(self) -> bytes:
+        """
+        对剩余数据进行 PKCS7 填充并输出最后的密文分组
+
+        :return: 最后一个密文分组（bytes）
+        """
+        if self._finalized:
+            raise ValueError("加密上下文已结束")
+        self._finalized = True
+        out = bytearray(16)
+        _cbc_encrypt_into(pkcs7_padding(bytes(self._buffer)), out, self._round_keys, self._prev)
+        self._buffer = bytearray()
+        return bytes(out)
+
+class SM4Decryptor:
+    """SM4 CBC 模式的增量解密上下文，始终保留最后一个分组直到 finalize 时去除填充"""
+
+    def __init__(self, round_keys: list[int], iv: bytes):
+        self._round_keys = round_keys
+        self._prev = bytes(iv)
+        self._buffer = bytearray()
+        self._finalized = False
+
+    def update(self, data) -> bytes:
+        """
+        解密一段任意长度的数据，最后一个完整分组暂不输出
+
+        :param data: 密文数据（bytes-like）
+        :return: 本次可输出的明文（bytes），长度为 16 的倍数
+        """
+        pending = len(self._buffer) + memoryview(data).nbytes
+        out = bytearray(max(0, (pending - 1) // 16 * 16))
+        self.update_into(data, out)
+        return bytes(out)
+
+    def update_into(self, data, out) -> int:
+        """
+        解密一段任意长度的数据，明文直接写入调用方提供的缓冲区
+
+        :param data: 密文数据（bytes-like）
+        :param out: 可写的输出缓冲区，长度不小于 len(data) + 15，且不能与 data 重叠
+        :return: 写入 out 的字节数（16 的倍数）
+        """
+        if self._finalized:
+            raise ValueError("解密上下文已结束")
+        data = memoryview(data).cast("B")
+        pending = len(self._buffer) + len(data)
+        size = max(0, (pending - 1) // 16 * 16)
+        if not size:
+            self._buffer += data
+            return 0
+        out = memoryview(out).cast("B")
+        if len(out) < size:
+            raise ValueError("输出缓冲区长度不足")
+
+        pos = 0
+        if self._buffer:
+            # 先用新数据补齐上次保留的分组
+            take = 16 - len(self._buffer)
+            self._buffer += data[:take]
+            block = bytes(self._buffer)
+            _cbc_decrypt_into(block, out, self._round_keys, self._prev)
+            self._prev = block
+            data = data[take:]
+            pos = 16
+
+        full = size - pos
+        if full:
+            _cbc_decrypt_into(data[:full], out[pos:], self._round_keys, self._prev)
+            self._prev = bytes(data[full - 16:full])
+        self._buffer = bytearray(data[full:])
+        return size
+
+    def finalize(self) -> bytes:
+        """
+        解密保留的最后一个分组并去除 PKCS7 填充
+
+        :return: 最后一段明文（bytes）
+        :raises ValueError: 密文长度不是 16 的非零倍数或填充无效
+        """
+        if self._finalized:
+            raise ValueError("解密上下文已结束")
+        self._finalized = True
+        if len(self._buffer) != 16:
+            raise ValueError("密文长度必须是16的非零倍数")
+        out = bytearray(16)
+        _cbc_decrypt_into(self._buffer, out, self._round_keys, self._prev)
+        self._buffer = bytearray()
+        return pkcs7_unpadding(bytes(out))
+
 class SM4(Cipher):
     def __init__(self, iv: bytes, key: bytes):
         self.iv = iv
@@ -59,6 +388,7 @@ class SM4(Cipher):
         self.FK = FK
         self.CK = CK
         self.round_keys = self._key_expansion(key)
+        self._decrypt_round_keys = self.round_keys[::-1]
 
     def _tau(self, B: int) -> int:
         """
@@ -133,15 +463,7 @@ class SM4(Cipher):
         :param round_keys: 32轮的加密密钥列表，每个密钥是32位整数
         :return: 加密后的16字节密文块（bytes）
         """
-        X = [int.from_bytes(plain_block[i*4:(i+1)*4], byteorder='big') for i in range(4)]
-
-        for i in range(32):
-            temp = X[i+1] ^ X[i+2] ^ X[i+3] ^ round_keys[i]
-            X.append(X[i] ^ self._T(temp))
-
-        # 注意：使用X[35]到X[32]逆序组合
-        cipher_block = b''.join(X[i].to_bytes(4, byteorder='big') for i in range(35, 31, -1))
-        return cipher_block
+        return _crypt_block(plain_block, round_keys)
 
     # SM4 解密函数
     def _decrypt_block(self, cipher_block: bytes, round_keys: list[int]) -> bytes:
@@ -152,15 +474,34 @@ class SM4(Cipher):
         :param round_keys: 32轮的加密密钥列表（与加密时相同），每个密钥是32位整数
         :return: 解密后的16字节明文块（bytes）
         """
-        X = [int.from_bytes(cipher_block[i*4:(i+1)*4], byteorder='big') for i in range(4)]
+        if round_keys is self.round_keys:
+            return _crypt_block(cipher_block, self._decrypt_round_keys)
+        return _crypt_block(cipher_block, round_keys[::-1])
 
-        for i in range(32):
-            temp = X[i+1] ^ X[i+2] ^ X[i+3] ^ round_keys[31 - i]
-            X.append(X[i] ^ self._T(temp))
+    def _encrypt_cbc_into(self, plaintext, iv: bytes, out) -> int:
+        """
+        SM4 CBC 模式加密函数，密文直接写入调用方提供的缓冲区
+
+        仅对末尾不完整的分组进行填充，完整分组直接从输入缓冲区读取。
+
+        :param plaintext: 明文数据（bytes-like）
+        :param iv: 初始向量（bytes），长度为16字节
+        :param out: 可写的输出缓冲区，长度不小于填充后的明文长度
+        :return: 写入 out 的密文长度
+        """
+        src = memoryview(plaintext).cast("B")
+        dst = memoryview(out).cast("B")
+        full = len(src) - len(src) % 16
+        if len(dst) < full + 16:
+            raise ValueError("输出缓冲区长度不足")
+
+        # 分组加密完整的明文块
+        prev = _cbc_encrypt_into(src[:full], dst, self.round_keys, _BLOCK.unpack(iv))
+
+        # 填充并加密最后一个分组
+        _cbc_encrypt_into(pkcs7_padding(bytes(src[full:])), dst[full:], self.round_keys, prev)
 
-        # 注意：同样使用X[35]到X[32]逆序组合
-        plain_block = b''.join(X[i].to_bytes(4, byteorder='big') for i in range(35, 31, -1))
-        return plain_block
+        return full + 16
 
     def _encrypt_cbc(self, plaintext: bytes, iv: bytes) -> bytes:
         """
@@ -170,25 +511,61 @@ class SM4(Cipher):
         :param iv: 初始向量（bytes），长度为16字节
         :return: 加密后的密文数据（bytes）
         """
-        # 填充明文数据
-        plaintext = pkcs7_padding(plaintext)
+        ciphertext = bytearray(len(plaintext) - len(plaintext) % 16 + 16)
+        self._encrypt_cbc_into(plaintext, iv, ciphertext)
+        return bytes(ciphertext)
 
-        # 初始化向量
-        prev_cipher_block = iv
-        ciphertext = b''
+    def _encrypt_ecb(self, data: bytes) -> bytes:
+        """
+        SM4 ECB 模式加密函数（不填充），所有分组批量并行处理
 
-        # 分组加密
-        for i in range(0, len(plaintext), 16):
-            block = plaintext[i:i+16]
-            # 与前一个密文块进行异或
-            block = xor_bytes(block, prev_cipher_block)
-            # 加密
-            encrypted_block = self._encrypt_block(block, self.round_keys)
-            ciphertext += encrypted_block
-            # 更新前一个密文块
-            prev_cipher_block = encrypted_block
+        :param data: 明文数据（bytes），长度必须是16的倍数
+        :return: 加密后的密文数据（bytes）
+        """
+        if len(data) % 16:
+            raise ValueError("数据长度必须是16的倍数")
+        out = bytearray(len(data))
+        _crypt_blocks(data, self.round_keys, out)
+        return bytes(out)
+
+    def _decrypt_ecb(self, data: bytes) -> bytes:
+        """
+        SM4 ECB 模式解密函数（不去填充），所有分组批量并行处理
 
-        return ciphertext
+        :param data: 密文数据（bytes），长度必须是16的倍数
+        :return: 解密后的明文数据（bytes）
+        """
+        if len(data) % 16:
+            raise ValueError("数据长度必须是16的倍数")
+        out = bytearray(len(data))
+        _crypt_blocks(data, self._decrypt_round_keys, out)
+        return bytes(out)
+
+    def _decrypt_cbc_into(self, ciphertext, iv: bytes, out) -> int:
+        """
+        SM4 CBC 模式解密函数，明文直接写入调用方提供的缓冲区
+
+        CBC 解密中每个分组只依赖于密文本身，因此先对全部密文分组批量解密，
+        再整体与前一个密文分组（首个分组为 IV）异或。
+
+        :param ciphertext: 密文数据（bytes-like），长度必须是16的倍数
+        :param iv: 初始向量（bytes），长度为16字节
+        :param out: 可写的输出缓冲区，长度不小于密文长度，且不能与密文重叠
+        :return: 去除填充后的明文长度（out 中其后的字节为填充数据）
+        """
+        src = memoryview(ciphertext).cast("B")
+        dst = memoryview(out).cast("B")
+        if not src or len(src) % 16:
+            raise ValueError("密文长度必须是16的非零倍数")
+        if len(dst) < len(src):
+            raise ValueError("输出缓冲区长度不足")
+
+        # 批量解密全部分组，并与前一个密文块异或
+        _cbc_decrypt_into(src, dst, self._decrypt_round_keys, iv)
+
+        # 校验最后一个分组的填充
+        last = bytes(dst[len(src) - 16:len(src)])
+        return len(src) - 16 + len(pkcs7_unpadding(last))
 
     def _decrypt_cbc(self, ciphertext: bytes, iv: bytes) -> bytes:
         """
@@ -198,26 +575,29 @@ class SM4(Cipher):
         :param iv: 初始向量（bytes），长度为16字节
         :return: 解密后的明文数据（bytes）
         """
-        # 初始化向量
-        prev_cipher_block = iv
-        decrypted_data = b''
-
-        # 分组解密
-        for i in range(0, len(ciphertext), 16):
-            block = ciphertext[i:i+16]
-            # 解密当前块
-            decrypted_block = self._decrypt_block(block, self.round_keys)
-            # 与前一个密文块异或
-            decrypted_block = xor_bytes(decrypted_block, prev_cipher_block)
-            decrypted_data += decrypted_block
-            # 更新前一个密文块
-            prev_cipher_block = block
-
-        # 去除填充数据
-        decrypted_data = pkcs7_unpadding(decrypted_data)
-
-        return decrypted_data
-    
+        decrypted_data = bytearray(len(ciphertext))
+        size = self._decrypt_cbc_into(ciphertext, iv, decrypted_data)
+
+        # 去除填充数据（原地截断，避免整体复制）
+        del decrypted_data[size:]
+        return bytes(decrypted_data)
+
+    def encryptor(self) -> SM4Encryptor:
+        """
+        创建 CBC 模式的增量加密上下文，可分块调用 update()，最后调用 finalize()
+
+        :return: 加密上下文
+        """
+        return SM4Encryptor(self.round_keys, self.iv)
+
+    def decryptor(self) -> SM4Decryptor:
+        """
+        创建 CBC 模式的增量解密上下文，可分块调用 update()，最后调用 finalize()
+
+        :return: 解密上下文
+        """
+        return SM4Decryptor(self._decrypt_round_keys, self.iv)
+
     def encrypt(self, plaintext: bytes) -> bytes:
         """
         SM4 加密接口函数，用于加密任意长度的明文数据
@@ -235,6 +615,27 @@ class SM4(Cipher):
         :return: 解密后的明文数据（bytes）
         """
         return self._decrypt_cbc(ciphertext, self.iv)
+
+    def encrypt_into(self, plaintext, out) -> int:
+        """
+        SM4 加密接口函数，从任意 bytes-like 对象（如 memoryview、mmap）读取明文，
+        密文直接写入调用方提供的缓冲区，不产生中间副本
+
+        :param plaintext: 明文数据（bytes-like）
+        :param out: 可写的输出缓冲区，长度至少为 len(plaintext) // 16 * 16 + 16
+        :return: 写入 out 的密文长度
+        """
+        return self._encrypt_cbc_into(plaintext, self.iv, out)
+
+    def decrypt_into(self, ciphertext, out) -> int:
+        """
+        SM4 解密接口函数，从任意 bytes-like 对象读取密文，明文直接写入调用方提供的缓冲区
+
+        :param ciphertext: 密文数据（bytes-like）
+        :param out: 可写的输出缓冲区，长度不小于密文长度，且不能与密文重叠
+        :return: 去除填充后的明文长度（out 中其后的字节为填充数据）
+        """
+        return self._decrypt_cbc_into(ciphertext, self.iv, out)
     
 if __name__ == '__main__':
     iv = b'0123456789012345'
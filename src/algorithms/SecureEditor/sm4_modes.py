@@ -0,0 +1,356 @@
+from concurrent.futures import ProcessPoolExecutor
+import hmac
+import os
+
+import numpy as np
+
+from .base import Cipher, AEADCipher
+from .sm4_cipher import SM4, _crypt_block, _crypt_blocks, _BATCH_BLOCKS
+
+# GCM 认证标签长度
+TAG_SIZE = 16
+
+# 未指定 IV 时随机生成的 IV 长度：CTR 为完整的初始计数器分组，GCM 为推荐的 12 字节
+CTR_IV_SIZE = 16
+NONCE_SIZE = 12
+
+# 每个工作进程至少分到的数据量，数据过少时进程间通信的开销会超过并行收益
+PARALLEL_MIN_BYTES = 1 << 20
+
+# GHASH 所用 GF(2^128) 的约简多项式（按 GCM 的位序表示）
+_GCM_R = 0xE1 << 120
+
+_MASK32 = 0xFFFFFFFF
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+
+def _counter_blocks(counter: int, start: int, count: int, width: int) -> np.ndarray:
+    """
+    生成从 counter + start 开始的 count 个计数器分组
+
+    :param counter: 初始计数器分组（128 位整数）
+    :param start: 起始分组序号
+    :param count: 分组个数
+    :param width: 参与递增的低位宽度（CTR 为 128，GCM 为 32）
+    :return: 形状为 (count, 4) 的大端 uint32 数组
+    """
+    blocks = np.empty((count, 4), dtype=">u4")
+    index = np.arange(start, start + count, dtype=np.uint64)
+    if width == 32:
+        blocks[:, 0] = counter >> 96
+        blocks[:, 1] = (counter >> 64) & _MASK32
+        blocks[:, 2] = (counter >> 32) & _MASK32
+        blocks[:, 3] = (index + (counter & _MASK32)) & _MASK32
+    else:
+        low = index + (counter & _MASK64)
+        high = (low < (counter & _MASK64)).astype(np.uint64) + (counter >> 64)
+        blocks[:, 0] = high >> 32
+        blocks[:, 1] = high & _MASK32
+        blocks[:, 2] = low >> 32
+        blocks[:, 3] = low & _MASK32
+    return blocks
+
+def _ctr_xor(round_keys: list[int], counter: int, start: int, data, out, width: int = 128) -> None:
+    """
+    计数器模式核心：批量加密计数器分组得到密钥流，并与数据异或
+
+    :param round_keys: 32 轮的轮密钥列表
+    :param counter: 初始计数器分组（128 位整数）
+    :param start: data 首字节所在的分组序号
+    :param data: 输入数据（bytes-like）
+    :param out: 可写的输出缓冲区，长度不小于 data
+    :param width: 参与递增的低位宽度（CTR 为 128，GCM 为 32）
+    """
+    size = len(data)
+    total = -(-size // 16)
+    for first in range(0, total, _BATCH_BLOCKS):
+        count = min(_BATCH_BLOCKS, total - first)
+        stream = bytearray(count * 16)
+        _crypt_blocks(_counter_blocks(counter, start + first, count, width), round_keys, stream)
+        lo = first * 16
+        n = min(size - lo, count * 16)
+        np.bitwise_xor(
+            np.frombuffer(data, dtype=np.uint8, count=n, offset=lo),
+            np.frombuffer(stream, dtype=np.uint8, count=n),
+            out=np.frombuffer(out, dtype=np.uint8, count=n, offset=lo),
+        )
+
+def _gf_mult(x: int, y: int) -> int:
+    """
+    GF(2^128) 上的乘法（GCM 位序），用于少量的通用乘法运算
+
+    :param x: 乘数（128 位整数）
+    :param y: 乘数（128 位整数）
+    :return: 乘积（128 位整数）
+    """
+    z = 0
+    for i in range(127, -1, -1):
+        if (x >> i) & 1:
+            z ^= y
+        y = (y >> 1) ^ _GCM_R if y & 1 else y >> 1
+    return z
+
+def _gf_pow(h: int, n: int) -> int:
+    """
+    计算 GF(2^128) 上的 H^n
+
+    :param h: 底数（128 位整数）
+    :param n: 指数
+    :return: H^n（128 位整数）
+    """
+    result = 1 << 127  # GCM 位序下的单位元
+    while n:
+        if n & 1:
+            result = _gf_mult(result, h)
+        h = _gf_mult(h, h)
+        n >>= 1
+    return result
+
+def _ghash_tables(h: int) -> list[list[int]]:
+    """
+    预计算 GHASH 的按字节查找表：tables[j][b] 为第 j 个字节取值 b、其余字节为 0 时与 H 的乘积
+
+    :param h: 哈希子密钥 H（128 位整数）
+    :return: 16 张 256 项的查找表
+    """
+    # powers[i] 为输入最高位起第 i 位单独置位时与 H 的乘积
+    powers = []
+    v = h
+    for _ in range(128):
+        powers.append(v)
+        v = (v >> 1) ^ _GCM_R if v & 1 else v >> 1
+
+    tables = []
+    for j in range(16):
+        table = [0] * 256
+        for k in range(8):
+            bit = 1 << k
+            p = powers[8 * j + 7 - k]
+            for b in range(bit):
+                table[bit | b] = table[b] ^ p
+        tables.append(table)
+    return tables
+
+def _ghash(tables: list[list[int]], data, y: int = 0) -> int:
+    """
+    以 y 为初值对 data 继续计算 GHASH，末尾不足 16 字节的部分补零
+
+    :param tables: _ghash_tables 生成的查找表
+    :param data: 输入数据（bytes-like）
+    :param y: 初始状态（128 位整数）
+    :return: 更新后的状态（128 位整数）
+    """
+    m0, m1, m2, m3, m4, m5, m6, m7, m8, m9, m10, m11, m12, m13, m14, m15 = tables
+    data = memoryview(data).cast("B")
+    full = len(data) - len(data) % 16
+    blocks = [int.from_bytes(data[i:i + 16], "big") for i in range(0, full, 16)]
+    if full < len(data):
+        blocks.append(int.from_bytes(bytes(data[full:]).ljust(16, b"\x00"), "big"))
+    for x in blocks:
+        y ^= x
+        y = (m0[y >> 120] ^ m1[(y >> 112) & 0xFF] ^ m2[(y >> 104) & 0xFF] ^ m3[(y >> 96) & 0xFF] ^
+             m4[(y >> 88) & 0xFF] ^ m5[(y >> 80) & 0xFF] ^ m6[(y >> 72) & 0xFF] ^ m7[(y >> 64) & 0xFF] ^
+             m8[(y >> 56) & 0xFF] ^ m9[(y >> 48) & 0xFF] ^ m10[(y >> 40) & 0xFF] ^ m11[(y >> 32) & 0xFF] ^
+             m12[(y >> 24) & 0xFF] ^ m13[(y >> 16) & 0xFF] ^ m14[(y >> 8) & 0xFF] ^ m15[y & 0xFF])
+    return y
+
+def _split(size: int, workers: int) -> list[tuple[int, int]]:
+    """
+    按分组边界将 [0, size) 划分为若干区间，每段不少于 PARALLEL_MIN_BYTES
+
+    :param size: 数据总长度
+    :param workers: 工作进程数
+    :return: 区间列表 [(起始偏移, 结束偏移), ...]
+    """
+    parts = max(1, min(workers, size // PARALLEL_MIN_BYTES))
+    if parts == 1:
+        return [(0, size)]
+    step = ((size + parts - 1) // parts + 15) // 16 * 16
+    return [(lo, min(size, lo + step)) for lo in range(0, size, step)]
+
+def _ctr_range(round_keys: list[int], counter: int, start: int, data: bytes, width: int) -> bytes:
+    """工作进程入口：对一个区间执行计数器模式加解密"""
+    out = bytearray(len(data))
+    _ctr_xor(round_keys, counter, start, data, out, width)
+    return bytes(out)
+
+def _gcm_range(round_keys: list[int], h: int, counter: int, start: int, data: bytes, decrypting: bool) -> tuple[bytes, int]:
+    """工作进程入口：对一个区间执行 GCM 的 CTR 加解密，并计算该区间密文的局部 GHASH"""
+    out = _ctr_range(round_keys, counter, start, data, 32)
+    return out, _ghash(_ghash_tables(h), data if decrypting else out)
+
+class SM4CTR(Cipher):
+    """
+    SM4 CTR 模式：以 iv 为初始计数器分组，按 128 位整体递增；密钥流可按分组区间拆分到多个进程
+
+    IV 按次指定，实例不保存 IV：加密时未指定则随机生成并置于密文之前，避免同一密钥下重复使用密钥流
+    """
+
+    def __init__(self, key: bytes, workers: int = 1):
+        self.round_keys = SM4(bytes(16), key).round_keys
+        self.workers = workers
+
+    def _crypt(self, data, iv: bytes) -> bytes:
+        """
+        CTR 模式加解密（两者相同），数据足够大时按区间分发到进程池并行处理
+
+        :param data: 输入数据（bytes-like）
+        :param iv: 初始计数器分组（16 字节）
+        :return: 输出数据（bytes）
+        """
+        if len(iv) != CTR_IV_SIZE:
+            raise ValueError("CTR 模式的初始计数器必须是16字节")
+        data = memoryview(data).cast("B")
+        counter = int.from_bytes(iv, "big")
+        ranges = _split(len(data), self.workers)
+        if len(ranges) == 1:
+            out = bytearray(len(data))
+            _ctr_xor(self.round_keys, counter, 0, data, out)
+            return bytes(out)
+
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [
+                pool.submit(_ctr_range, self.round_keys, counter, lo // 16, bytes(data[lo:hi]), 128)
+                for lo, hi in ranges
+            ]
+            return b"".join(future.result() for future in futures)
+
+    def encrypt(self, plaintext: bytes, iv: bytes = None) -> bytes:
+        """
+        SM4-CTR 加密接口函数
+
+        :param plaintext: 明文数据（bytes）
+        :param iv: 本次使用的初始计数器分组，同一密钥下不可重复使用；
+                   为 None 时随机生成，输出为 IV || 密文
+        :return: 密文数据（bytes），指定 iv 时与明文等长
+        """
+        if iv is None:
+            iv = os.urandom(CTR_IV_SIZE)
+            return iv + self._crypt(plaintext, iv)
+        return self._crypt(plaintext, iv)
+
+    def decrypt(self, ciphertext: bytes, iv: bytes = None) -> bytes:
+        """
+        SM4-CTR 解密接口函数
+
+        :param ciphertext: 密文数据（bytes）
+        :param iv: 加密时指定的初始计数器分组；为 None 时从密文开头读取
+        :return: 明文数据（bytes）
+        """
+        if iv is None:
+            if len(ciphertext) < CTR_IV_SIZE:
+                raise ValueError("密文长度不足")
+            iv = bytes(ciphertext[:CTR_IV_SIZE])
+            ciphertext = memoryview(ciphertext)[CTR_IV_SIZE:]
+        return self._crypt(ciphertext, iv)
+
+class SM4GCM(AEADCipher):
+    """
+    SM4 GCM 模式：CTR 加密配合 GHASH 认证，输出为 密文 || 16 字节认证标签
+
+    IV 按次指定，实例不保存 IV：加密时未指定则随机生成 12 字节 IV 并置于输出之前，
+    避免同一密钥下重复使用 IV（这会同时破坏机密性与认证）
+
+    workers 大于 1 时，单次加解密不少于 PARALLEL_MIN_BYTES 的大块数据才把密钥流分发到进程池；
+    受控文件按 64 KiB 分块逐条加密，其并行由 secure_core.stream_save 在分块层面完成
+    """
+
+    def __init__(self, key: bytes, workers: int = 1):
+        self.round_keys = SM4(bytes(16), key).round_keys
+        self.workers = workers
+        self._h = int.from_bytes(_crypt_block(bytes(16), self.round_keys), "big")
+        self._tables = _ghash_tables(self._h)
+
+    def _j0(self, iv: bytes) -> int:
+        """
+        由 IV 计算预计数器分组 J0（推荐使用 12 字节 IV）
+
+        :param iv: 初始向量（bytes）
+        :return: J0（128 位整数）
+        """
+        if len(iv) == 12:
+            return int.from_bytes(iv + b"\x00\x00\x00\x01", "big")
+        if not iv:
+            raise ValueError("GCM 模式的 IV 不能为空")
+        y = _ghash(self._tables, iv)
+        return _ghash(self._tables, (len(iv) * 8).to_bytes(16, "big"), y)
+
+    def _crypt(self, data, associated_data, iv: bytes, decrypting: bool) -> tuple[bytes, bytes]:
+        """
+        GCM 核心流程：CTR 加解密，并对关联数据与密文计算认证标签
+
+        数据足够大时按区间分发到进程池，各进程同时完成 CTR 与局部 GHASH，
+        再由 Y = Y·H^n ⊕ P 将各区间的局部结果按顺序合并。
+
+        :param data: 输入数据（bytes-like）
+        :param associated_data: 关联数据（bytes-like）
+        :param iv: 初始向量（bytes）
+        :param decrypting: data 是否为密文
+        :return: (输出数据, 认证标签)
+        """
+        data = memoryview(data).cast("B")
+        j0 = self._j0(iv)
+        counter = (j0 & ~_MASK32) | ((j0 + 1) & _MASK32)
+        y = _ghash(self._tables, associated_data)
+
+        ranges = _split(len(data), self.workers)
+        if len(ranges) == 1:
+            out = bytearray(len(data))
+            _ctr_xor(self.round_keys, counter, 0, data, out, 32)
+            y = _ghash(self._tables, data if decrypting else out, y)
+            out = bytes(out)
+        else:
+            with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+                futures = [
+                    pool.submit(_gcm_range, self.round_keys, self._h, counter, lo // 16, bytes(data[lo:hi]), decrypting)
+                    for lo, hi in ranges
+                ]
+                chunks = []
+                for (lo, hi), future in zip(ranges, futures):
+                    chunk, partial = future.result()
+                    y = _gf_mult(y, _gf_pow(self._h, -(-(hi - lo) // 16))) ^ partial
+                    chunks.append(chunk)
+            out = b"".join(chunks)
+
+        lengths = (len(associated_data) * 8 << 64) | (len(data) * 8)
+        y = _ghash(self._tables, lengths.to_bytes(16, "big"), y)
+        tag = y ^ int.from_bytes(_crypt_block(j0.to_bytes(16, "big"), self.round_keys), "big")
+        return out, tag.to_bytes(TAG_SIZE, "big")
+
+    def encrypt(self, plaintext: bytes, associated_data: bytes = b"", iv: bytes = None) -> bytes:
+        """
+        SM4-GCM 加密接口函数
+
+        :param plaintext: 明文数据（bytes）
+        :param associated_data: 参与认证但不加密的关联数据（bytes）
+        :param iv: 本次使用的 IV，同一密钥下不可重复使用；为 None 时随机生成，输出为 IV || 密文 || 认证标签
+        :return: 密文 || 认证标签（bytes）
+        """
+        if iv is None:
+            iv = os.urandom(NONCE_SIZE)
+            ciphertext, tag = self._crypt(plaintext, associated_data, iv, False)
+            return iv + ciphertext + tag
+        ciphertext, tag = self._crypt(plaintext, associated_data, iv, False)
+        return ciphertext + tag
+
+    def decrypt(self, ciphertext: bytes, associated_data: bytes = b"", iv: bytes = None) -> bytes:
+        """
+        SM4-GCM 解密接口函数，认证标签校验通过后才返回明文
+
+        :param ciphertext: 密文 || 认证标签（bytes）
+        :param associated_data: 加密时使用的关联数据（bytes）
+        :param iv: 加密时指定的 IV；为 None 时从密文开头读取 12 字节 IV
+        :return: 明文数据（bytes）
+        :raises ValueError: 数据过短或认证标签校验失败
+        """
+        if iv is None:
+            if len(ciphertext) < NONCE_SIZE:
+                raise ValueError("密文长度不足")
+            iv = bytes(ciphertext[:NONCE_SIZE])
+            ciphertext = memoryview(ciphertext)[NONCE_SIZE:]
+        if len(ciphertext) < TAG_SIZE:
+            raise ValueError("密文长度不足")
+        body = memoryview(ciphertext)[:len(ciphertext) - TAG_SIZE]
+        plaintext, tag = self._crypt(body, associated_data, iv, True)
+        if not hmac.compare_digest(tag, bytes(ciphertext[-TAG_SIZE:])):
+            raise ValueError("认证标签校验失败")
+        return plaintext
@@ -27,13 +27,14 @@ def pkcs7_unpadding(data: bytes) -> bytes:
 
 def xor_bytes(a: bytes, b: bytes) -> bytes:
     """
-    对两个字节数组进行逐字节的异或操作
+    对两个字节数组进行异或操作，以整数形式一次性完成整段异或
 
     :param a: 字节数组 a
     :param b: 字节数组 b
-    :return: 异或后的结果（bytes）
+    :return: 异或后的结果（bytes），长度为两者中较短者
     """
-    return bytes(x ^ y for x, y in zip(a, b))
+    n = min(len(a), len(b))
+    return (int.from_bytes(a[:n], 'big') ^ int.from_bytes(b[:n], 'big')).to_bytes(n, 'big')
 
 def bytes_to_list(data: bytes) -> list:
     """
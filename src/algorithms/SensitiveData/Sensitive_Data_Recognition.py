@@ -1,14 +1,29 @@
 import re
+import io
 import json
 import hashlib
 import logging
-from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass
+import warnings
+from typing import Callable, Dict, Iterator, List, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
 from enum import Enum
+from fnmatch import fnmatch
+from itertools import repeat
 import pandas as pd
 import os
+import time
 from datetime import datetime
 
+# 流式扫描 CSV 时每批读入的行数，峰值内存由它决定而与文件大小无关
+CSV_CHUNKSIZE = 100000
+
+# 并行扫描大文本文件时每个分段的大致字节数（分段在换行处切开），每个工作进程一次读入一个分段
+TXT_RANGE_SIZE = 16 * 1024 * 1024
+
+# 目录扫描默认包含的文件（即 detect_file 支持的类型）
+DEFAULT_INCLUDE = ("*.txt", "*.csv", "*.xlsx", "*.xls")
+
 
 class SensitiveDataType(Enum):
     ID_CARD = "身份证号"
@@ -19,6 +34,14 @@ class SensitiveDataType(Enum):
     IP_ADDRESS = "IP地址"
 
 
+class ScanMode(Enum):
+    # 兼容模式：与逐类型扫描的结果完全一致（同一位置可被多个类型重复命中），
+    # 先用合并后的正则整体判断一次，无命中的文本直接跳过
+    COMPAT = "compat"
+    # 快速模式：合并后的正则单次扫描，匹配互不重叠，同一位置取置信度最高的类型
+    FAST = "fast"
+
+
 @dataclass
 class DetectionResult:
     data_type: SensitiveDataType
@@ -31,9 +54,19 @@ class DetectionResult:
 
 
 class SensitiveDataDetector:
-    def __init__(self):
+    def __init__(self, scan_mode: ScanMode = ScanMode.COMPAT, csv_chunksize: Optional[int] = None,
+                 txt_workers: Optional[int] = None):
+        """
+        :param scan_mode: 文本扫描模式
+        :param csv_chunksize: 设置时 CSV 按此行数分批流式扫描（见 iter_detect_csv），否则整表读入
+        :param txt_workers: 大于 1 时，超过 TXT_RANGE_SIZE 的 txt 文件分段后用多进程并行扫描（见 detect_txt_parallel）
+        """
         self.logger = self._setup_logger()
         self.patterns = self._load_patterns()
+        self.scan_mode = scan_mode
+        self.csv_chunksize = csv_chunksize
+        self.txt_workers = txt_workers
+        self._compile_patterns()
 
     def _setup_logger(self) -> logging.Logger:
         logger = logging.getLogger("SensitiveDataDetector")
@@ -76,22 +109,52 @@ class SensitiveDataDetector:
             }
         }
 
-    def detect_text(self, text: str, context_len=20) -> List[DetectionResult]:
+    def _compile_patterns(self):
+        """预编译各类型的正则，并按置信度从高到低合并为一个带命名分组的正则"""
+        self._compiled = [
+            (data_type, re.compile(cfg['pattern']), cfg['confidence'])
+            for data_type, cfg in self.patterns.items()
+        ]
+        ordered = sorted(self.patterns.items(), key=lambda item: -item[1]['confidence'])
+        # 各正则都以 \b 开头时把它提到分支之外，每个位置只判断一次单词边界，
+        # 否则合并后的正则会比逐个扫描还慢
+        prefix = r'\b' if all(cfg['pattern'].startswith(r'\b') for cfg in self.patterns.values()) else ''
+        self._combined = re.compile(prefix + '(?:' + '|'.join(
+            f"(?P<{data_type.name}>{cfg['pattern'][len(prefix):]})" for data_type, cfg in ordered
+        ) + ')')
+        self._group_types = {
+            data_type.name: (data_type, cfg['confidence']) for data_type, cfg in ordered
+        }
+
+    def detect_text(self, text: str, context_len=20,
+                    scan_mode: Optional[ScanMode] = None) -> List[DetectionResult]:
+        scan_mode = scan_mode or self.scan_mode
+        if scan_mode is ScanMode.FAST:
+            matches = (
+                (match, *self._group_types[match.lastgroup])
+                for match in self._combined.finditer(text)
+            )
+        elif self._combined.search(text) is None:
+            return []
+        else:
+            matches = (
+                (match, data_type, confidence)
+                for data_type, pattern, confidence in self._compiled
+                for match in pattern.finditer(text)
+            )
+
         results = []
-        for data_type, cfg in self.patterns.items():
-            pattern = cfg['pattern']
-            confidence = cfg['confidence']
-            for match in re.finditer(pattern, text):
-                value = match.group()
-                start, end = match.span()
-                context = text[max(0, start - context_len):min(len(text), end + context_len)]
-                results.append(DetectionResult(
-                    data_type=data_type,
-                    value=value,
-                    position=(start, end),
-                    confidence=confidence,
-                    context=context
-                ))
+        for match, data_type, confidence in matches:
+            value = match.group()
+            start, end = match.span()
+            context = text[max(0, start - context_len):min(len(text), end + context_len)]
+            results.append(DetectionResult(
+                data_type=data_type,
+                value=value,
+                position=(start, end),
+                confidence=confidence,
+                context=context
+            ))
         return results
 
     def detect_file(self, file_path: str) -> List[DetectionResult]:
@@ -110,43 +173,114 @@ class SensitiveDataDetector:
             return []
 
     def _detect_txt(self, path: str) -> List[DetectionResult]:
-        results = []
+        if self.txt_workers and self.txt_workers > 1 and os.path.getsize(path) > TXT_RANGE_SIZE:
+            return self.detect_txt_parallel(path, self.txt_workers)
         with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-            for i, line in enumerate(f, 1):
-                for res in self.detect_text(line):
-                    res.file_path = path
-                    res.line_number = i
-                    results.append(res)
+            return self._scan_lines(f, path)[0]
+
+    def _scan_lines(self, lines, path: str) -> Tuple[List[DetectionResult], int]:
+        """逐行检测，行号从 1 开始；返回检测结果与行数"""
+        results = []
+        count = 0
+        for count, line in enumerate(lines, 1):
+            for res in self.detect_text(line):
+                res.file_path = path
+                res.line_number = count
+                results.append(res)
+        return results, count
+
+    def _scan_txt_range(self, path: str, start: int, end: int) -> Tuple[List[DetectionResult], int]:
+        """检测文件中 [start, end) 字节范围内的行，行号相对于该范围；解码与换行处理和整文件读取一致"""
+        with open(path, 'rb') as f:
+            f.seek(start)
+            data = f.read(end - start)
+        with io.TextIOWrapper(io.BytesIO(data), encoding='utf-8', errors='ignore') as lines:
+            return self._scan_lines(lines, path)
+
+    def detect_txt_parallel(self, path: str, workers: Optional[int] = None,
+                            range_size: int = TXT_RANGE_SIZE) -> List[DetectionResult]:
+        """
+        将大文本文件在换行处切分为若干字节范围，分发到进程池并行检测，合并时换算为整个文件中的行号
+
+        分段只在 \n 之后切开：UTF-8 多字节字符中不会出现 0x0A，\r\n 也不会被拆开，
+        因此结果与逐行扫描整个文件完全一致
+
+        :param path: txt 文件路径
+        :param workers: 工作进程数，默认为 CPU 核数；为 1 时在当前进程中顺序处理
+        :param range_size: 每个分段的大致字节数
+        :return: 检测结果（按行顺序）
+        """
+        ranges = split_lines(path, range_size)
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1 or len(ranges) <= 1:
+            parts = [self._scan_txt_range(path, start, end) for start, end in ranges]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(self.scan_mode, self.csv_chunksize)) as pool:
+                parts = list(pool.map(_scan_txt_range_in_worker, repeat(path),
+                                      [start for start, _ in ranges], [end for _, end in ranges]))
+
+        results = []
+        offset = 0
+        for part, count in parts:
+            for res in part:
+                res.line_number += offset
+            results.extend(part)
+            offset += count
         return results
 
     def _detect_csv(self, path: str) -> List[DetectionResult]:
-        results = []
+        if self.csv_chunksize:
+            return list(self.iter_detect_csv(path, self.csv_chunksize))
         df = pd.read_csv(path, encoding='utf-8', low_memory=False)
-        for row_i, row in df.iterrows():
-            for col in df.columns:
-                val = str(row[col])
-                for res in self.detect_text(val):
-                    res.file_path = path
-                    res.line_number = row_i + 2
-                    res.context = f"{col}: {val}"
-                    results.append(res)
-        return results
+        return self._detect_frame(df, path)
+
+    def iter_detect_csv(self, path: str, chunksize: int = CSV_CHUNKSIZE) -> Iterator[DetectionResult]:
+        """
+        流式扫描 CSV：每次只读入 chunksize 行，逐批产出检测结果，行号为整个文件中的行号
+
+        各列按原始文本读入（dtype=str），不做类型推断，避免同一列在不同批次中被推断为不同类型
+
+        :param path: CSV 文件路径
+        :param chunksize: 每批读入的行数
+        :return: 检测结果迭代器（按行、列顺序）
+        """
+        with pd.read_csv(path, encoding='utf-8', dtype=str, chunksize=chunksize) as reader:
+            for df in reader:
+                yield from self._detect_frame(df, path)
 
     def _detect_excel(self, path: str) -> List[DetectionResult]:
         results = []
         xls = pd.ExcelFile(path)
         for sheet in xls.sheet_names:
             df = pd.read_excel(xls, sheet_name=sheet)
-            for row_i, row in df.iterrows():
-                for col in df.columns:
-                    val = str(row[col])
-                    for res in self.detect_text(val):
-                        res.file_path = path
-                        res.line_number = row_i + 2
-                        res.context = f"{sheet}-{col}: {val}"
-                        results.append(res)
+            results.extend(self._detect_frame(df, path, f"{sheet}-"))
         return results
 
+    def _detect_frame(self, df: pd.DataFrame, path: str, prefix: str = "") -> List[DetectionResult]:
+        """
+        按列扫描表格：每列只转换一次字符串，用合并正则向量化筛出命中的单元格，
+        再只对这些单元格提取匹配；结果按行、列顺序排列，行号为表格行号（表头为第 1 行）
+        """
+        found = []
+        for col_i, col in enumerate(df.columns):
+            values = df.iloc[:, col_i].astype(str)
+            with warnings.catch_warnings():
+                # 合并正则中的命名分组用于区分类型，这里只判断是否命中
+                warnings.simplefilter('ignore', UserWarning)
+                hits = values.str.contains(self._combined).to_numpy()
+            for pos in hits.nonzero()[0]:
+                val = values.iat[pos]
+                results = self.detect_text(val)
+                for res in results:
+                    res.file_path = path
+                    res.line_number = df.index[pos] + 2
+                    res.context = f"{prefix}{col}: {val}"
+                found.append((pos, col_i, results))
+
+        found.sort(key=lambda item: (item[0], item[1]))
+        return [res for _, _, results in found for res in results]
+
     def summarize(self, results: List[DetectionResult]) -> str:
         if not results:
             return "未检测到敏感数据"
@@ -162,8 +296,182 @@ class SensitiveDataDetector:
         return "\n".join(lines)
 
 
-# 提供给前端：基于文件路径检测
-def run_from_path(file_path: str) -> str:
+@dataclass
+class FileScanResult:
+    path: str
+    counts: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+@dataclass
+class ScanReport:
+    root: str
+    files: List[FileScanResult] = field(default_factory=list)
+    type_counts: Dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return sum(self.type_counts.values())
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for f in self.files if f.error is not None)
+
+
+def split_lines(path: str, range_size: int = TXT_RANGE_SIZE) -> List[Tuple[int, int]]:
+    """
+    将文件切分为若干首尾相接的字节范围，除最后一段外每段都在 \n 之后结束
+
+    :param range_size: 每段的大致字节数（实际会延伸到下一个换行符）
+    :return: (起始偏移, 结束偏移) 列表
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    start = 0
+    with open(path, 'rb') as f:
+        while start < size:
+            f.seek(start + range_size)
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _matches(rel_path: str, patterns) -> bool:
+    """文件名或相对路径（以 / 分隔）匹配任一 glob 模式"""
+    name = os.path.basename(rel_path)
+    return any(fnmatch(name, p) or fnmatch(rel_path, p) for p in patterns)
+
+
+def find_files(root: str, include=DEFAULT_INCLUDE, exclude=()) -> List[str]:
+    """
+    递归列出 root 下匹配 include 且不匹配 exclude 的文件；匹配 exclude 的目录不再进入
+
+    :param include: 包含的 glob 模式，按文件名或相对路径匹配
+    :param exclude: 排除的 glob 模式，按文件名/目录名或相对路径匹配
+    :return: 排序后的文件路径列表
+    """
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir + "/"
+        dirnames[:] = sorted(d for d in dirnames if not _matches(rel_dir + d, exclude))
+        for name in sorted(filenames):
+            rel_path = rel_dir + name
+            if _matches(rel_path, include) and not _matches(rel_path, exclude):
+                paths.append(os.path.join(dirpath, name))
+    return paths
+
+
+def _scan_file(detector: SensitiveDataDetector, path: str) -> FileScanResult:
+    """检测单个文件并按类型计数，异常转换为失败结果而不中断整个扫描"""
+    try:
+        counts = {}
+        for r in detector.detect_file(path):
+            counts[r.data_type.value] = counts.get(r.data_type.value, 0) + 1
+        return FileScanResult(path, counts)
+    except Exception as e:
+        return FileScanResult(path, error=str(e))
+
+
+# 工作进程各自持有一个检测器，正则只在进程启动时编译一次
+_worker_detector: Optional[SensitiveDataDetector] = None
+
+
+def _init_worker(scan_mode: ScanMode, csv_chunksize: Optional[int]):
+    global _worker_detector
+    _worker_detector = SensitiveDataDetector(scan_mode, csv_chunksize)
+
+
+def _scan_in_worker(path: str) -> FileScanResult:
+    return _scan_file(_worker_detector, path)
+
+
+def _scan_txt_range_in_worker(path: str, start: int, end: int) -> Tuple[List[DetectionResult], int]:
+    return _worker_detector._scan_txt_range(path, start, end)
+
+
+def scan_directory(root: str, include=DEFAULT_INCLUDE, exclude=(), workers: Optional[int] = None,
+                   scan_mode: ScanMode = ScanMode.COMPAT,
+                   csv_chunksize: Optional[int] = None,
+                   progress: Optional[Callable[[int, int], None]] = None) -> ScanReport:
+    """
+    递归扫描目录中的文件，分发到进程池并行检测，汇总为逐文件与按类型的计数
+
+    :param root: 目录路径
+    :param include: 包含的 glob 模式
+    :param exclude: 排除的 glob 模式
+    :param workers: 工作进程数，默认为 CPU 核数；为 1 时在当前进程中顺序处理
+    :param scan_mode: 文本扫描模式
+    :param csv_chunksize: CSV 分批流式扫描的行数，默认与 SensitiveDataDetector 一致为 None（整表读入），
+                          使同一文件单独检测与随目录扫描的结果相同
+    :param progress: 进度回调 (已完成文件数, 文件总数)，在调用 scan_directory 的线程中调用
+    :return: 扫描报告（文件按路径排序）
+    """
+    start = time.perf_counter()
+    paths = find_files(root, include, exclude)
+    workers = workers or os.cpu_count() or 1
+    report = ScanReport(os.path.abspath(root))
+
+    def collect(results: Iterator[FileScanResult]):
+        for result in results:
+            report.files.append(result)
+            if progress is not None:
+                progress(len(report.files), len(paths))
+
+    if progress is not None:
+        progress(0, len(paths))
+    if workers <= 1 or len(paths) <= 1:
+        detector = SensitiveDataDetector(scan_mode, csv_chunksize)
+        collect(_scan_file(detector, path) for path in paths)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(scan_mode, csv_chunksize)) as pool:
+            # 小文件很多时按批分发，减少进程间通信次数
+            chunksize = max(1, min(64, len(paths) // (workers * 4)))
+            collect(pool.map(_scan_in_worker, paths, chunksize=chunksize))
+
+    for f in report.files:
+        for key, count in f.counts.items():
+            report.type_counts[key] = report.type_counts.get(key, 0) + count
+    report.seconds = time.perf_counter() - start
+    return report
+
+
+def summarize_report(report: ScanReport, max_files: int = 20) -> str:
+    """将目录扫描报告格式化为文本：总体与按类型计数，以及命中最多的文件"""
+    lines = [f"共扫描 {len(report.files)} 个文件（失败 {report.failed} 个），"
+             f"检测到 {report.total} 项敏感数据，用时 {report.seconds:.1f} 秒"]
+    for k, v in report.type_counts.items():
+        lines.append(f"- {k}: {v} 项")
+
+    hit_files = sorted((f for f in report.files if f.total), key=lambda f: -f.total)
+    if hit_files:
+        lines.append(f"包含敏感数据的文件（{len(hit_files)} 个）：")
+        for f in hit_files[:max_files]:
+            detail = "，".join(f"{k} {v}" for k, v in f.counts.items())
+            lines.append(f"- {os.path.relpath(f.path, report.root)}: {f.total} 项（{detail}）")
+        if len(hit_files) > max_files:
+            lines.append(f"……其余 {len(hit_files) - max_files} 个文件未列出")
+
+    failed_files = [f for f in report.files if f.error is not None]
+    if failed_files:
+        lines.append("检测失败的文件：")
+        for f in failed_files[:max_files]:
+            lines.append(f"- {os.path.relpath(f.path, report.root)}: {f.error}")
+    return "\n".join(lines)
+
+
+# 提供给前端：基于文件或目录路径检测
+def run_from_path(file_path: str, progress: Optional[Callable[[int, int], None]] = None) -> str:
+    if os.path.isdir(file_path):
+        return summarize_report(scan_directory(file_path, progress=progress))
     detector = SensitiveDataDetector()
     results = detector.detect_file(file_path)
     return detector.summarize(results)
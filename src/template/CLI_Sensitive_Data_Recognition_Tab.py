@@ -1,15 +1,42 @@
+import os
+
+from PyQt5.QtCore import QThread, pyqtSignal
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QFileDialog
 from qfluentwidgets import (
     TitleLabel, StrongBodyLabel, LineEdit, PushButton,
-    FluentIcon, TextEdit, PrimaryPushButton
+    FluentIcon, TextEdit, PrimaryPushButton, ProgressBar
 )
 
 
+class DetectionWorker(QThread):
+    """在后台线程中执行检测，避免扫描目录时阻塞界面"""
+
+    progress = pyqtSignal(int, int)  # 已完成文件数, 文件总数
+    succeeded = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, script, path, parent=None):
+        super().__init__(parent)
+        self.script = script
+        self.path = path
+
+    def run(self):
+        try:
+            if os.path.isdir(self.path):
+                result = self.script(self.path, progress=self.progress.emit)
+            else:
+                result = self.script(self.path)
+            self.succeeded.emit(str(result))
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
 class CLI_Sensitive_Data_Recognition_Tab(QWidget):
     def __init__(self, tab_name="数据脱敏", algorithm_name="敏感数据脱敏", script=None):
         super().__init__()
 
         self.script_func = script  # 脱敏执行函数（如 run_from_path）
+        self.worker = None
 
         layout = QVBoxLayout()
         layout.setContentsMargins(0, 0, 0, 0)
@@ -24,19 +51,28 @@ class CLI_Sensitive_Data_Recognition_Tab(QWidget):
         self.file_input.setPlaceholderText("请选择要脱敏的文件")
         self.file_input.setReadOnly(True)
 
-        browse_button = PushButton(FluentIcon.FOLDER, "选择文件")
-        browse_button.clicked.connect(self.browse_file)
+        self.browse_button = PushButton(FluentIcon.FOLDER, "选择文件")
+        self.browse_button.clicked.connect(self.browse_file)
+
+        self.browse_dir_button = PushButton(FluentIcon.FOLDER, "选择文件夹")
+        self.browse_dir_button.clicked.connect(self.browse_directory)
 
         self.detect_button = PrimaryPushButton("开始检测")
         self.detect_button.setEnabled(False)
         self.detect_button.clicked.connect(self.start_detection)
 
         file_layout.addWidget(self.file_input)
-        file_layout.addWidget(browse_button)
+        file_layout.addWidget(self.browse_button)
+        file_layout.addWidget(self.browse_dir_button)
         file_layout.addWidget(self.detect_button)
 
         layout.addLayout(file_layout)
 
+        # 目录扫描进度
+        self.progress_bar = ProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+
         # 结果显示区域
         self.result_display = TextEdit()
         self.result_display.setReadOnly(True)
@@ -52,6 +88,14 @@ class CLI_Sensitive_Data_Recognition_Tab(QWidget):
             self.result_display.clear()
             self.detect_button.setEnabled(True)
 
+    def browse_directory(self):
+        dir_path = QFileDialog.getExistingDirectory(self, "选择文件夹", "")
+        if dir_path:
+            self.file_path = dir_path
+            self.file_input.setText(dir_path)
+            self.result_display.clear()
+            self.detect_button.setEnabled(True)
+
     def start_detection(self):
         self.result_display.clear()
 
@@ -63,9 +107,26 @@ class CLI_Sensitive_Data_Recognition_Tab(QWidget):
             self.result_display.append("⚠️ 文件路径为空！")
             return
 
-        try:
-            self.result_display.append("开始脱敏处理...")
-            result = self.script_func(self.file_path)
-            self.result_display.append(str(result))
-        except Exception as e:
-            self.result_display.append(f"发生错误：{str(e)}")
+        self.result_display.append("开始脱敏处理...")
+        self.set_running(True)
+        self.worker = DetectionWorker(self.script_func, self.file_path, self)
+        self.worker.progress.connect(self.update_progress)
+        self.worker.succeeded.connect(self.result_display.append)
+        self.worker.failed.connect(lambda msg: self.result_display.append(f"发生错误：{msg}"))
+        self.worker.finished.connect(lambda: self.set_running(False))
+        self.worker.start()
+
+    def update_progress(self, done, total):
+        self.progress_bar.setRange(0, max(total, 1))
+        self.progress_bar.setValue(done)
+        self.file_input.setText(f"{self.file_path}（已扫描 {done}/{total} 个文件）")
+
+    def set_running(self, running):
+        # 检测期间禁止重新选择文件或再次启动检测
+        self.browse_button.setEnabled(not running)
+        self.browse_dir_button.setEnabled(not running)
+        self.detect_button.setEnabled(not running)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(running and os.path.isdir(self.file_path))
+        if not running:
+            self.file_input.setText(self.file_path)